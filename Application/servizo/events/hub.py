@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+STAFF_ROLES = {"admin", "manager", "waiter"}
+
+
+class Event:
+    __slots__ = ("id", "type", "table_num", "roles", "data")
+
+    def __init__(self, id, type, data, table_num=None, roles=None):
+        self.id = id
+        self.type = type
+        self.data = data
+        self.table_num = table_num
+        self.roles = roles
+
+    def to_json(self):
+        return json.dumps({"id": self.id, "type": self.type, "table_num": self.table_num, "data": self.data},
+                          cls=DjangoJSONEncoder)
+
+
+class Subscription:
+    def __init__(self, hub, table_num=None, role=None):
+        self.hub = hub
+        self.table_num = table_num
+        self.role = role
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+
+    def matches(self, event):
+        if self.table_num is not None and event.table_num != self.table_num:
+            return False
+        return event.roles is None or self.role in event.roles
+
+    def _put(self, event):
+        if self.queue.full():
+            # spor klijent: zatvaramo tok, pa se ponovo kaci sa Last-Event-ID
+            self.hub.unsubscribe(self)
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    # fan-out u okviru jednog procesa; publish se zove iz sync view-ova (thread pool),
+    # a pretplatnici zive na event loop-u, pa se predaje kroz call_soon_threadsafe
+    def __init__(self, buffer_size):
+        self._seq = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, type, data, table_num=None, roles=None):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, type, data, table_num, frozenset(roles) if roles else None)
+            self._buffer.append(event)
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                # loop je vec zatvoren
+                self.unsubscribe(sub)
+        return event
+
+    def subscribe(self, table_num=None, role=None, last_id=None):
+        sub = Subscription(self, table_num, role)
+        with self._lock:
+            self._subscribers.add(sub)
+            if last_id is None:
+                return sub, []
+
+            oldest = self._buffer[0].id if self._buffer else self._seq + 1
+            if last_id > self._seq or last_id + 1 < oldest:
+                # propusteni dogadjaji vise nisu u baferu (ili je server restartovan)
+                return sub, [Event(self._seq, "reset", {})]
+            return sub, [e for e in self._buffer if e.id > last_id and sub.matches(e)]
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+hub = EventHub(settings.EVENTS_BUFFER_SIZE)
+
+
+def publish(type, data, table_num=None, roles=None):
+    return hub.publish(type, data, table_num, roles)
@@ -0,0 +1,25 @@
+from .hub import STAFF_ROLES
+
+
+def user_role(user):
+    if user is None or not user.is_authenticated:
+        return "customer"
+    return getattr(user, "role", None) or "customer"
+
+
+def subscription_params(params, role, last_event_id=None):
+    try:
+        table_num = int(params["table"]) if params.get("table") else None
+        last_id = last_event_id or params.get("last_id")
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        raise ValueError("Parameters 'table' and 'last_id' must be integers")
+
+    # gosti vide samo dogadjaje svog stola
+    if role not in STAFF_ROLES and table_num is None:
+        raise ValueError("Parameter 'table' is required")
+    return table_num, last_id
+
+
+def sse_message(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.to_json()}\n\n"
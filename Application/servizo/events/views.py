@@ -0,0 +1,46 @@
+import asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from helpers.responses import bad_request
+from .hub import hub
+from .utils import user_role, subscription_params, sse_message
+
+
+@require_GET
+async def event_stream(request):
+    # pod WSGI-jem Django async iterator cita do kraja, pa stream nikad ne bi poceo a thread bi ostao zauzet
+    if not isinstance(request, ASGIRequest):
+        return bad_request("The event stream requires an ASGI server (see README)", status=501)
+
+    role = user_role(await request.auser())
+    try:
+        table_num, last_id = subscription_params(request.GET, role, request.headers.get("Last-Event-ID"))
+    except ValueError as e:
+        return bad_request(str(e))
+
+    sub, replay = hub.subscribe(table_num, role, last_id)
+
+    async def stream():
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+            for event in replay:
+                yield sse_message(event)
+
+            while True:
+                try:
+                    event = await sub.get(settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    break
+                yield sse_message(event)
+        finally:
+            hub.unsubscribe(sub)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,69 @@
+import asyncio
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from .hub import hub
+from .utils import user_role, subscription_params
+
+WEBSOCKET_PATH = "/api/events/ws/"
+
+
+@sync_to_async
+def _scope_role(scope):
+    # bez channels-a: korisnika citamo iz session cookie-ja kao SessionMiddleware
+    cookies = SimpleCookie()
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return user_role(None)
+
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value)
+    return user_role(get_user(SimpleNamespace(session=session)))
+
+
+async def websocket_application(scope, receive, send):
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    if scope["path"] != WEBSOCKET_PATH:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    role = await _scope_role(scope)
+    params = dict(parse_qsl(scope.get("query_string", b"").decode()))
+    try:
+        table_num, last_id = subscription_params(params, role)
+    except ValueError:
+        await send({"type": "websocket.close", "code": 4400})
+        return
+
+    await send({"type": "websocket.accept"})
+    sub, replay = hub.subscribe(table_num, role, last_id)
+
+    async def forward():
+        for event in replay:
+            await send({"type": "websocket.send", "text": event.to_json()})
+        while True:
+            event = await sub.get()
+            if event is None:
+                await send({"type": "websocket.close", "code": 4408})
+                return
+            await send({"type": "websocket.send", "text": event.to_json()})
+
+    sender = asyncio.ensure_future(forward())
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        sender.cancel()
+        hub.unsubscribe(sub)
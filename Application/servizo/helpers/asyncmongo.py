@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from django.db import connections
+from pymongo import AsyncMongoClient
+
+_clients = {}
+_lock = threading.Lock()
+
+
+async def _close_with_loop(loop, client):
+    # asyncio.run (pa i async_to_sync pod WSGI-jem) pre zatvaranja loop-a zatvara sve zapocete
+    # async generatore, pa se klijent zatvara u svom loop-u dok su mu konekcije jos zive
+    try:
+        yield
+    finally:
+        with _lock:
+            if _clients.get(loop, (None,))[0] is client:
+                del _clients[loop]
+        await client.close()
+
+
+async def _start(closer):
+    await closer.__anext__()
+
+
+async def _close_stale(client):
+    try:
+        await client.close()
+    except RuntimeError:
+        # deo zatvaranja trazi mrtav loop; preostale konekcije zatvara GC
+        pass
+
+
+def async_database(alias="default"):
+    # jedan AsyncMongoClient (i njegov pool konekcija) po event loop-u, deli ga svaki async view;
+    # parametri su isti kao za sinhroni MongoClient backend-a
+    loop = asyncio.get_running_loop()
+    wrapper = connections[alias]
+    with _lock:
+        # loop zatvoren bez shutdown_asyncgens, klijent zatvaramo iz tekuceg loop-a
+        for closed in [l for l in _clients if l.is_closed()]:
+            stale, _ = _clients.pop(closed)
+            loop.create_task(_close_stale(stale))
+
+        entry = _clients.get(loop)
+        if entry is None:
+            client = AsyncMongoClient(**wrapper.get_connection_params())
+            closer = _close_with_loop(loop, client)
+            # loop cuva samo slabu referencu na generator, zato ga drzimo uz klijenta
+            entry = _clients[loop] = (client, closer)
+            loop.create_task(_start(closer))
+    return entry[0][wrapper.settings_dict["NAME"]]
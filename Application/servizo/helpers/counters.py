@@ -0,0 +1,25 @@
+from django.db import connection
+from pymongo import ReturnDocument
+
+COUNTERS_COLLECTION = "counters"
+
+
+def bump_counter(name: str) -> int:
+    doc = connection.get_collection(COUNTERS_COLLECTION).find_one_and_update(
+        {"_id": name},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["value"]
+
+
+def get_counter(name: str) -> int:
+    doc = connection.get_collection(COUNTERS_COLLECTION).find_one({"_id": name}, {"value": 1})
+    return doc["value"] if doc else 0
+
+
+async def aget_counter(name: str) -> int:
+    from helpers.asyncmongo import async_database
+    doc = await async_database()[COUNTERS_COLLECTION].find_one({"_id": name}, {"value": 1})
+    return doc["value"] if doc else 0
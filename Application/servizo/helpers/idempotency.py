@@ -0,0 +1,186 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from inspect import iscoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils import timezone
+from pymongo import ReturnDocument
+from helpers.asyncmongo import async_database
+from helpers.responses import bad_request
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+# mora da odgovara TTL indeksu iz orders/migrations/0004_idempotency_keys.py
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+MAX_KEY_LENGTH = 200
+
+PENDING = "pending"
+DONE = "done"
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+_cache = _LRU(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def _replay(stored):
+    response = HttpResponse(stored["body"], status=stored["status"], content_type=stored["content_type"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _reserve_filter(doc_id, fingerprint, now):
+    return ({"_id": doc_id}, {"$setOnInsert": {"fingerprint": fingerprint, "state": PENDING, "created_at": now}})
+
+
+def _takeover_filter(doc_id, now):
+    # worker koji je drzao kljuc je verovatno pao, preuzimamo ga
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT)
+    return ({"_id": doc_id, "state": PENDING, "created_at": {"$lt": stale}}, {"$set": {"created_at": now}})
+
+
+def _needs_takeover(existing, fingerprint):
+    return existing is not None and existing["state"] == PENDING and existing["fingerprint"] == fingerprint
+
+
+def _reserve(keys, doc_id, fingerprint):
+    # jedan upit: upsert vraca None ako je kljuc nov, inace postojeci zapis
+    now = timezone.now()
+    existing = keys.find_one_and_update(*_reserve_filter(doc_id, fingerprint, now),
+                                        upsert=True, return_document=ReturnDocument.BEFORE)
+    if not _needs_takeover(existing, fingerprint):
+        return existing
+    taken = keys.update_one(*_takeover_filter(doc_id, now))
+    return None if taken.modified_count else existing
+
+
+async def _areserve(keys, doc_id, fingerprint):
+    now = timezone.now()
+    existing = await keys.find_one_and_update(*_reserve_filter(doc_id, fingerprint, now),
+                                              upsert=True, return_document=ReturnDocument.BEFORE)
+    if not _needs_takeover(existing, fingerprint):
+        return existing
+    taken = await keys.update_one(*_takeover_filter(doc_id, now))
+    return None if taken.modified_count else existing
+
+
+def _request_key(request):
+    key = request.headers.get("Idempotency-Key")
+    if len(key) > MAX_KEY_LENGTH:
+        return None, bad_request(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+    return (f"{request.path}|{key}", hashlib.sha256(request.body).hexdigest()), None
+
+
+def _answer(doc_id, stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return bad_request("Idempotency-Key was already used with a different request", status=422)
+    if stored["state"] == PENDING:
+        return bad_request("A request with this Idempotency-Key is still being processed", status=409)
+
+    _cache.put(doc_id, stored)
+    return _replay(stored)
+
+
+def _to_store(response, fingerprint):
+    # greske servera se ne pamte, klijent sme da pokusa ponovo
+    if response.status_code >= 500 or response.streaming:
+        return None
+    return {
+        "fingerprint": fingerprint,
+        "state": DONE,
+        "status": response.status_code,
+        "body": response.content.decode("utf-8"),
+        "content_type": response.get("Content-Type"),
+    }
+
+
+def idempotent(view_func):
+    # ponovljen zahtev sa istim Idempotency-Key zaglavljem dobija sacuvani odgovor
+    if iscoroutinefunction(view_func):
+        return _async_idempotent(view_func)
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not request.headers.get("Idempotency-Key"):
+            return view_func(request, *args, **kwargs)
+        ids, error = _request_key(request)
+        if error is not None:
+            return error
+        doc_id, fingerprint = ids
+
+        stored = _cache.get(doc_id)
+        if stored is None:
+            keys = connection.get_collection(IDEMPOTENCY_COLLECTION)
+            stored = _reserve(keys, doc_id, fingerprint)
+            if stored is None:
+                try:
+                    response = view_func(request, *args, **kwargs)
+                except Exception:
+                    keys.delete_one({"_id": doc_id})
+                    raise
+
+                stored = _to_store(response, fingerprint)
+                if stored is None:
+                    keys.delete_one({"_id": doc_id})
+                else:
+                    keys.update_one({"_id": doc_id}, {"$set": stored})
+                    _cache.put(doc_id, stored)
+                return response
+
+        return _answer(doc_id, stored, fingerprint)
+    return _wrapped
+
+
+def _async_idempotent(view_func):
+    @wraps(view_func)
+    async def _wrapped(request, *args, **kwargs):
+        if not request.headers.get("Idempotency-Key"):
+            return await view_func(request, *args, **kwargs)
+        ids, error = _request_key(request)
+        if error is not None:
+            return error
+        doc_id, fingerprint = ids
+
+        stored = _cache.get(doc_id)
+        if stored is None:
+            keys = async_database()[IDEMPOTENCY_COLLECTION]
+            stored = await _areserve(keys, doc_id, fingerprint)
+            if stored is None:
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                except Exception:
+                    await keys.delete_one({"_id": doc_id})
+                    raise
+
+                stored = _to_store(response, fingerprint)
+                if stored is None:
+                    await keys.delete_one({"_id": doc_id})
+                else:
+                    await keys.update_one({"_id": doc_id}, {"$set": stored})
+                    _cache.put(doc_id, stored)
+                return response
+
+        return _answer(doc_id, stored, fingerprint)
+    return _wrapped
@@ -0,0 +1,79 @@
+from django.db import connection
+from django.utils.module_loading import autodiscover_modules
+
+# svaka aplikacija u svom indexes.py prijavljuje indekse i oblike upita koje koristi
+_indexes = []
+_queries = []
+
+
+def declare_index(collection, keys, **options):
+    _indexes.append((collection, [(k, d) for k, d in keys], options))
+
+
+def declare_query(name, collection, filter, sort=None):
+    _queries.append((name, collection, filter, sort))
+
+
+def load_declarations():
+    if not _indexes and not _queries:
+        autodiscover_modules("indexes")
+    return _indexes, _queries
+
+
+def _normalize(keys):
+    # server moze da vrati smer kao 1.0
+    return tuple((k, int(d) if isinstance(d, float) else d) for k, d in keys)
+
+
+def _key_name(keys):
+    return ", ".join(f"{k}:{d}" for k, d in keys)
+
+
+def ensure_indexes(create=True):
+    # vraca (kolekcija, kljuc, poruka) za svaki indeks koji nedostaje ili se ne poklapa
+    problems = []
+    created = []
+    for collection_name, keys, options in _indexes:
+        collection = connection.get_collection(collection_name)
+        existing = {_normalize(info["key"]): info for info in collection.index_information().values()}
+        info = existing.get(_normalize(keys))
+
+        if info is None:
+            if not create:
+                problems.append((collection_name, _key_name(keys), "missing"))
+                continue
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                problems.append((collection_name, _key_name(keys), f"cannot be created: {e}"))
+                continue
+            created.append((collection_name, _key_name(keys)))
+            continue
+
+        for option, value in options.items():
+            if option != "name" and info.get(option) != value:
+                problems.append((collection_name, _key_name(keys), f"exists with {option}={info.get(option)}"))
+    return created, problems
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def explain_queries():
+    # vraca (ime, kolekcija, faze plana) za svaki prijavljeni oblik upita
+    results = []
+    for name, collection_name, filter, sort in _queries:
+        cursor = connection.get_collection(collection_name).find(filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        results.append((name, collection_name, list(_stages(plan))))
+    return results
@@ -0,0 +1,50 @@
+import logging
+import threading
+from functools import wraps
+from django.conf import settings
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+
+
+class _CommandCounter(monitoring.CommandListener):
+    def started(self, event):
+        commands = getattr(_local, "commands", None)
+        if commands is not None:
+            commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# mora biti registrovan pre nego sto se napravi MongoClient (vidi OrdersConfig.ready)
+monitoring.register(_CommandCounter())
+
+
+def query_budget(limit: int):
+    # broji Mongo komande koje view posalje i upozorava kad predje limit
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            outer = getattr(_local, "commands", None)
+            _local.commands = []
+            try:
+                response = view_func(request, *args, **kwargs)
+            finally:
+                commands = _local.commands
+                _local.commands = outer
+                if outer is not None:
+                    outer.extend(commands)
+
+            if len(commands) > limit:
+                logger.warning("%s used %d Mongo commands (budget %d): %s",
+                               view_func.__name__, len(commands), limit, ", ".join(commands))
+            if settings.DEBUG:
+                response["X-Mongo-Commands"] = str(len(commands))
+            return response
+        return _wrapped
+    return decorator
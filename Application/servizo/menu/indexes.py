@@ -0,0 +1,21 @@
+from datetime import datetime
+from bson import ObjectId
+from helpers.indexes import declare_index, declare_query
+from .models import MenuItem, MenuCategory
+
+ITEMS = MenuItem._meta.db_table
+CATEGORIES = MenuCategory._meta.db_table
+
+# prefiks category_id sluzi i za stavke po kategoriji, ceo kljuc za keyset stranice menija
+declare_index(ITEMS, [("category_id", 1), ("name", 1), ("_id", 1)])
+declare_index(ITEMS, [("last_updated", 1)])
+declare_index(CATEGORIES, [("ancestors", 1)])
+declare_index(CATEGORIES, [("path", 1)])
+declare_index(CATEGORIES, [("last_updated", 1)])
+
+declare_query("items_by_category", ITEMS, {"category_id": {"$in": [ObjectId()]}})
+declare_query("menu_items_page", ITEMS, {"category_id": ObjectId(), "name": {"$gt": ""}}, [("name", 1), ("_id", 1)])
+declare_query("menu_item_changes", ITEMS, {"last_updated": {"$gt": datetime(2000, 1, 1)}})
+declare_query("category_descendants", CATEGORIES, {"ancestors": ObjectId()})
+declare_query("category_by_path", CATEGORIES, {"path": "Drinks"})
+declare_query("category_changes", CATEGORIES, {"last_updated": {"$gt": datetime(2000, 1, 1)}})
@@ -0,0 +1,20 @@
+import sys
+from django.core.management.base import BaseCommand
+from menu.transfer import export_menu
+
+
+class Command(BaseCommand):
+    help = "Export the menu as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--output", help="Output file, stdout by default")
+
+    def handle(self, *args, **options):
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in export_menu(options["format"]):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
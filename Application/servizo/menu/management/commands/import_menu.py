@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from menu.transfer import detect_format, import_menu
+
+
+class Command(BaseCommand):
+    help = "Import menu categories and items from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or detect_format(options["path"])
+        try:
+            with open(options["path"], "rb") as f:
+                report = import_menu(f, fmt, options["batch_size"])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created_categories']} categories and {report['created_items']} items "
+            f"({len(report['errors'])} rows skipped)"
+        ))
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    # kolekcije nisu managed, pa indekse pravimo rucno
+    connection = schema_editor.connection
+    connection.get_collection("menu_items").create_index("category_id")
+    connection.get_collection("menu_categories").create_index("ancestors")
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    connection.get_collection("menu_items").drop_index("category_id_1")
+    connection.get_collection("menu_categories").drop_index("ancestors_1")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
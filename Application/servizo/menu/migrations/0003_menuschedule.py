@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:12
+
+import bson.objectid
+import django_mongodb_backend.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0002_menu_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSchedule',
+            fields=[
+                ('id', django_mongodb_backend.fields.ObjectIdField(db_column='_id', default=bson.objectid.ObjectId, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('item_id', django_mongodb_backend.fields.ObjectIdField(blank=True, null=True)),
+                ('category_id', django_mongodb_backend.fields.ObjectIdField(blank=True, null=True)),
+                ('weekdays', django_mongodb_backend.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('discount_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('available', models.BooleanField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'menu_schedules',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:40
+
+import bson.objectid
+import django_mongodb_backend.fields
+from django.db import migrations, models
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    connection.get_collection("menu_items").create_index("last_updated")
+    connection.get_collection("menu_categories").create_index("last_updated")
+    # tombstone-ovi se brisu sami posle MenuTombstone.RETENTION_DAYS
+    connection.get_collection("menu_tombstones").create_index(
+        "deleted_at", name="menu_tombstones_ttl", expireAfterSeconds=30 * 24 * 60 * 60)
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    connection.get_collection("menu_items").drop_index("last_updated_1")
+    connection.get_collection("menu_categories").drop_index("last_updated_1")
+    connection.get_collection("menu_tombstones").drop_index("menu_tombstones_ttl")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_menuschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuTombstone',
+            fields=[
+                ('id', django_mongodb_backend.fields.ObjectIdField(db_column='_id', default=bson.objectid.ObjectId, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=10)),
+                ('object_id', django_mongodb_backend.fields.ObjectIdField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'menu_tombstones',
+            },
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -3,6 +3,12 @@ from django_mongodb_backend.fields import ObjectIdField
 from django_mongodb_backend.fields import ArrayField
 from functools import cached_property
 from bson import ObjectId
+from .tree import category_index
+
+class Station(models.TextChoices):
+    KITCHEN = "kitchen", "Kitchen"
+    BAR = "bar", "Bar"
+
 
 # Create your models here.
 class MenuCategory(models.Model):
@@ -12,6 +18,9 @@ class MenuCategory(models.Model):
     parent = ObjectIdField(null=True, blank=True)
     path = models.CharField(max_length=150, editable=False)
     ancestors = ArrayField(ObjectIdField(), size=8, blank=True, default=list, editable=False)
+    # prazno znaci da se stanica nasledjuje od roditelja
+    station = models.CharField(max_length=20, choices=Station.choices, null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True, null=True, editable=False)
 
     @cached_property
     def descendants(self):
@@ -22,13 +31,15 @@ class MenuCategory(models.Model):
         if self.parent is None:
             return None
         else:
-            return MenuCategory.objects.filter(id=self.parent).path
+            return category_index().path(self.parent)
     
     def save(self, *args, **kwargs):
         if self.parent:
-            parent = MenuCategory.objects.get(id=self.parent)
+            parent = category_index(fresh=True).get(self.parent)
+            if parent is None:
+                raise MenuCategory.DoesNotExist(f"Parent category {self.parent} not found")
 
-            self.ancestors = parent.ancestors + [parent.id]
+            self.ancestors = list(parent.ancestors) + [parent.id]
             self.path = f"{parent.path}/{self.name}"
         else:
             self.ancestors = []
@@ -56,16 +67,55 @@ class MenuItem(models.Model):
 
     @cached_property
     def category_name(self):
-        category = MenuCategory.objects.get(id=self.category_id)
-        return category.name
+        return category_index().name(self.category_id)
     
     @cached_property
     def category(self):
-        return MenuCategory.objects.get(id=self.category_id)
+        return category_index().get(self.category_id)
 
     class Meta:
         db_table = "menu_items"
         managed = False
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class MenuSchedule(models.Model):
+    id = ObjectIdField(primary_key=True, default=ObjectId, db_column="_id")
+
+    name = models.CharField(max_length=50)
+    # pravilo vazi ili za jednu stavku ili za celo podstablo kategorije
+    item_id = ObjectIdField(null=True, blank=True)
+    category_id = ObjectIdField(null=True, blank=True)
+    # 0 = ponedeljak ... 6 = nedelja, prazno znaci svaki dan
+    weekdays = ArrayField(models.IntegerField(), default=list, blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    available = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        db_table = "menu_schedules"
+
+    def __str__(self):
+        return self.name
+
+
+class MenuTombstone(models.Model):
+    ITEM = "item"
+    CATEGORY = "category"
+    # klijenti koji nisu sinhronizovani duze od ovoga moraju ponovo da ucitaju ceo meni
+    RETENTION_DAYS = 30
+
+    id = ObjectIdField(primary_key=True, default=ObjectId, db_column="_id")
+    kind = models.CharField(max_length=10)
+    object_id = ObjectIdField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "menu_tombstones"
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted"
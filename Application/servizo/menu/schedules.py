@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from bson import ObjectId
+from helpers.counters import bump_counter, get_counter
+from .snapshot import get_menu_snapshot, menu_version
+from .tree import category_index
+
+SCHEDULES_VERSION_COUNTER = "menu_schedules"
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+CENT = Decimal("0.01")
+
+
+def minute_of_week(at=None):
+    at = timezone.localtime(at, ZoneInfo(settings.VENUE_TIME_ZONE))
+    return at.weekday() * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def _intervals(rule):
+    start = rule.start_time.hour * 60 + rule.start_time.minute
+    end = rule.end_time.hour * 60 + rule.end_time.minute
+    if end <= start:
+        end += MINUTES_PER_DAY  # npr. 22:00 - 02:00 prelazi u sledeci dan
+
+    for day in rule.weekdays or range(7):
+        lo = day * MINUTES_PER_DAY + start
+        hi = day * MINUTES_PER_DAY + end
+        if hi <= MINUTES_PER_WEEK:
+            yield lo, hi
+        else:
+            yield lo, MINUTES_PER_WEEK
+            yield 0, hi - MINUTES_PER_WEEK
+
+
+class ScheduleIndex:
+    # nedelja je podeljena na segmente izmedju svih pocetaka/krajeva pravila,
+    # za svaki segment su unapred izracunata aktivna pravila po stavci i kategoriji
+    def __init__(self, rules, version):
+        self.version = version
+
+        events = []
+        for order, rule in enumerate(sorted(rules, key=lambda r: r.id)):
+            for lo, hi in _intervals(rule):
+                events.append((lo, hi, order, rule))
+
+        self.boundaries = sorted({0} | {lo for lo, _, _, _ in events} | {hi for _, hi, _, _ in events if hi < MINUTES_PER_WEEK})
+        self.segments = []
+        for start in self.boundaries:
+            active = sorted((e for e in events if e[0] <= start < e[1]), key=lambda e: e[2])
+            items, categories = {}, {}
+            for _, _, _, rule in active:
+                # kasnije dodato pravilo pobedjuje
+                if rule.item_id:
+                    items[rule.item_id] = rule
+                elif rule.category_id:
+                    categories[rule.category_id] = rule
+            self.segments.append((items, categories))
+
+    def segment(self, at=None):
+        return bisect_right(self.boundaries, minute_of_week(at)) - 1
+
+    def targets(self, segment):
+        # stavke i kategorije na koje deluje neko pravilo u datom segmentu
+        items, categories = self.segments[segment]
+        return set(items), set(categories)
+
+    def rule_for(self, segment, item_id, category_id):
+        items, categories = self.segments[segment]
+        rule = items.get(item_id)
+        if rule is not None or not categories:
+            return rule
+
+        # najbliza kategorija u podstablu ima prednost
+        index = category_index()
+        for cid in (category_id, *reversed(index.ancestors(category_id))):
+            rule = categories.get(cid)
+            if rule is not None:
+                return rule
+        return None
+
+    def resolve(self, segment, item_id, category_id, price, available):
+        rule = self.rule_for(segment, item_id, category_id)
+        if rule is None:
+            return price, available
+
+        if rule.price is not None:
+            price = rule.price
+        elif rule.discount_percent is not None and price is not None:
+            price = (price * (100 - rule.discount_percent) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+
+        if rule.available is not None:
+            available = available and rule.available
+        return price, available
+
+
+def schedules_version() -> int:
+    return get_counter(SCHEDULES_VERSION_COUNTER)
+
+
+def schedules_changed() -> int:
+    # posebna verzija pravila, da sinhronizacija menija zna kada cene treba poslati ponovo
+    return bump_counter(SCHEDULES_VERSION_COUNTER)
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def schedule_index(version=None) -> ScheduleIndex:
+    global _index, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.MENU_SCHEDULE_REFRESH_SECONDS:
+        if version is None or version == _index.version:
+            return _index
+
+    with _lock:
+        # pravila se menjaju kroz invalidate_menu, pa je verzija menija dovoljna
+        if version is None:
+            version = menu_version()
+        if _index is None or _index.version != version:
+            from .models import MenuSchedule
+            _index = ScheduleIndex(list(MenuSchedule.objects.all()), version)
+        _checked_at = now
+        return _index
+
+
+def cached_schedule_index(version):
+    # bez upita: vraca indeks samo ako je vec ucitan za ovu verziju menija
+    index = _index
+    return index if index is not None and index.version == version else None
+
+
+def effective_state(item, at=None):
+    index = schedule_index()
+    return index.resolve(index.segment(at), item.id, item.category_id, item.price, item.available)
+
+
+def apply_schedule(data, index, segment):
+    # isto kao effective_state, ali nad vec serijalizovanom stavkom iz snapshot-a
+    price, available = index.resolve(
+        segment, ObjectId(data["id"]), ObjectId(data["category_id"]), Decimal(data["price"]), data["available"])
+    return {**data, "price": str(price), "available": available}
+
+
+def scheduled_snapshot_key(version, segment):
+    return f"menu:snapshot:{version}:{segment}"
+
+
+def get_scheduled_snapshot(version, segment):
+    key = scheduled_snapshot_key(version, segment)
+    body = cache.get(key)
+    if body is None:
+        index = schedule_index(version)
+        data = [apply_schedule(d, index, segment) for d in json.loads(get_menu_snapshot(version))]
+        body = json.dumps(data)
+        cache.set(key, body, settings.MENU_SNAPSHOT_TIMEOUT)
+    return body
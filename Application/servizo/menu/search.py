@@ -0,0 +1,145 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+from django.conf import settings
+from .snapshot import get_menu_snapshot, menu_version
+
+TOKEN_RE = re.compile(r"\w+")
+# slova koja NFKD ne razlaze na osnovno slovo + kvacicu
+FOLD_MAP = str.maketrans({"đ": "dj", "Đ": "dj", "ß": "ss", "æ": "ae", "ø": "o", "ł": "l"})
+
+
+def fold(text: str) -> str:
+    text = (text or "").translate(FOLD_MAP)
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(fold(text))
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids", "name_ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+        self.name_ids = set()
+
+
+class SearchIndex:
+    def __init__(self, items, version):
+        self.version = version
+        self.items = {}
+        self.root = _TrieNode()
+        for item in items:
+            self.add(item)
+
+    def _walk(self, token, item_id, in_name, remove=False):
+        node = self.root
+        for ch in token:
+            child = node.children.get(ch)
+            if child is None:
+                if remove:
+                    return
+                child = node.children[ch] = _TrieNode()
+            node = child
+            if remove:
+                node.ids.discard(item_id)
+                node.name_ids.discard(item_id)
+            else:
+                node.ids.add(item_id)
+                if in_name:
+                    node.name_ids.add(item_id)
+
+    def _tokens(self, item):
+        name_tokens = set(tokenize(item["name"]))
+        other_tokens = set(tokenize(item.get("description"))) | set(tokenize(item.get("category")))
+        return name_tokens, other_tokens - name_tokens
+
+    def add(self, item):
+        item_id = item["id"]
+        if item_id in self.items:
+            self.remove(item_id)
+
+        self.items[item_id] = item
+        name_tokens, other_tokens = self._tokens(item)
+        for token in name_tokens:
+            self._walk(token, item_id, in_name=True)
+        for token in other_tokens:
+            self._walk(token, item_id, in_name=False)
+
+    def remove(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        name_tokens, other_tokens = self._tokens(item)
+        for token in name_tokens | other_tokens:
+            self._walk(token, item_id, in_name=False, remove=True)
+
+    def _lookup(self, token):
+        node = self.root
+        for ch in token:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def search(self, query: str, limit: int = 20):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        ids = name_ids = None
+        for token in tokens:
+            node = self._lookup(token)
+            if node is None:
+                return []
+            # menu_items_changed menja skupove u mestu bez lock-a citalaca, pa radimo nad kopijama
+            node_ids, node_name_ids = set(node.ids), set(node.name_ids)
+            ids = node_ids if ids is None else ids & node_ids
+            name_ids = node_name_ids if name_ids is None else name_ids & node_name_ids
+
+        found = {i: item for i in ids if (item := self.items.get(i)) is not None}
+        # prvo stavke kojima se svi termini poklapaju u nazivu
+        ranked = sorted(found, key=lambda i: (i not in name_ids, fold(found[i]["name"])))
+        return [found[i] for i in ranked[:max(limit, 1)]]
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def search_index() -> SearchIndex:
+    global _index, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.SEARCH_INDEX_REFRESH_SECONDS:
+        return _index
+
+    with _lock:
+        version = menu_version()
+        if _index is None or _index.version != version:
+            _index = SearchIndex(json.loads(get_menu_snapshot(version)), version)
+        _checked_at = now
+        return _index
+
+
+def menu_items_changed(version, items=(), removed=()):
+    global _index
+
+    with _lock:
+        if _index is None:
+            return
+        if _index.version == version - 1 and (items or removed):
+            for item_id in removed:
+                _index.remove(str(item_id))
+            for item in items:
+                _index.add(item)
+            _index.version = version
+        else:
+            _index = None
@@ -0,0 +1,61 @@
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from helpers.counters import bump_counter, get_counter
+from .models import MenuItem
+from .tree import category_index
+
+MENU_VERSION_COUNTER = "menu"
+
+
+def menu_version() -> int:
+    return get_counter(MENU_VERSION_COUNTER)
+
+
+def invalidate_menu(items=(), removed=()) -> int:
+    # svaki upis u meni podize verziju, stari snapshot-ovi isticu sami iz kesa
+    version = bump_counter(MENU_VERSION_COUNTER)
+
+    from .search import menu_items_changed
+    categories = category_index(fresh=True)
+    changed = [json.loads(json.dumps(serialize_menu_item(i, categories), cls=DjangoJSONEncoder)) for i in items]
+    menu_items_changed(version, changed, removed)
+    return version
+
+
+def serialize_menu_item(item, categories):
+    return {
+        "id": str(item.id),
+        "name": item.name,
+        "category": categories.name(item.category_id),
+        "category_id": str(item.category_id),
+        "price": str(item.price),
+        "available": item.available,
+        "description": item.description,
+        "last_updated": item.last_updated,
+    }
+
+
+def build_menu_snapshot() -> str:
+    # snapshot se kesira pod novom verzijom menija, pa ni imena kategorija ne smeju da kasne
+    categories = category_index(fresh=True)
+    data = [serialize_menu_item(i, categories) for i in MenuItem.objects.all()]
+    return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def get_menu_snapshot(version: int) -> str:
+    key = f"menu:snapshot:{version}"
+    body = cache.get(key)
+    if body is None:
+        body = build_menu_snapshot()
+        cache.set(key, body, settings.MENU_SNAPSHOT_TIMEOUT)
+    return body
+
+
+def menu_etag(request):
+    from .schedules import schedule_index
+    request.menu_version = menu_version()
+    # cene i dostupnost zavise od rasporeda, pa je i segment nedelje deo ETag-a
+    request.menu_segment = schedule_index(request.menu_version).segment()
+    return f"menu-{request.menu_version}-{request.menu_segment}"
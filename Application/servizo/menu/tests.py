@@ -1,3 +1,109 @@
-from django.test import TestCase
+from datetime import datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from bson import ObjectId
+from django.test import SimpleTestCase, override_settings
+from .schedules import ScheduleIndex, minute_of_week, MINUTES_PER_DAY
 
-# Create your tests here.
+MONDAY, SATURDAY, SUNDAY = 0, 5, 6
+
+
+def rule(start, end, weekdays=(), item_id=None, category_id=None, price=None, discount=None, available=None):
+    return SimpleNamespace(
+        id=ObjectId(), item_id=item_id, category_id=category_id, weekdays=list(weekdays),
+        start_time=time(*start), end_time=time(*end),
+        price=None if price is None else Decimal(price),
+        discount_percent=None if discount is None else Decimal(discount),
+        available=available,
+    )
+
+
+def at(day, hour, minute=0):
+    return day * MINUTES_PER_DAY + hour * 60 + minute
+
+
+class StubCategories:
+    def __init__(self, ancestors):
+        self._ancestors = ancestors
+
+    def ancestors(self, category_id):
+        return self._ancestors.get(category_id, ())
+
+
+class ScheduleIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.item = ObjectId()
+        self.drinks, self.beer = ObjectId(), ObjectId()
+        patcher = mock.patch("menu.schedules.category_index",
+                             return_value=StubCategories({self.beer: (self.drinks,)}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def state(self, index, minute, category_id=None, price="10.00", available=True):
+        with mock.patch("menu.schedules.minute_of_week", return_value=minute):
+            segment = index.segment()
+        return index.resolve(segment, self.item, category_id or self.beer, Decimal(price), available)
+
+    def test_rule_applies_only_inside_interval(self):
+        index = ScheduleIndex([rule((17, 0), (19, 0), item_id=self.item, discount="50")], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 16, 59)), (Decimal("10.00"), True))
+        self.assertEqual(self.state(index, at(MONDAY, 17, 0)), (Decimal("5.00"), True))
+        self.assertEqual(self.state(index, at(MONDAY, 18, 59)), (Decimal("5.00"), True))
+        self.assertEqual(self.state(index, at(MONDAY, 19, 0)), (Decimal("10.00"), True))
+
+    def test_interval_wraps_past_midnight(self):
+        index = ScheduleIndex([rule((22, 0), (2, 0), weekdays=[SATURDAY], item_id=self.item, available=False)], 1)
+        self.assertEqual(self.state(index, at(SATURDAY, 23, 30))[1], False)
+        self.assertEqual(self.state(index, at(SUNDAY, 1, 59))[1], False)
+        self.assertEqual(self.state(index, at(SUNDAY, 2, 0))[1], True)
+        self.assertEqual(self.state(index, at(SATURDAY, 1, 0))[1], True)
+
+    def test_sunday_night_wraps_into_monday(self):
+        index = ScheduleIndex([rule((23, 0), (1, 0), weekdays=[SUNDAY], item_id=self.item, price="3.00")], 1)
+        self.assertEqual(self.state(index, at(SUNDAY, 23, 30))[0], Decimal("3.00"))
+        self.assertEqual(self.state(index, at(MONDAY, 0, 30))[0], Decimal("3.00"))
+        self.assertEqual(self.state(index, at(MONDAY, 1, 0))[0], Decimal("10.00"))
+
+    def test_item_rule_beats_category_rule(self):
+        index = ScheduleIndex([
+            rule((0, 0), (23, 59), item_id=self.item, price="4.00"),
+            rule((0, 0), (23, 59), category_id=self.beer, price="6.00"),
+        ], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 12))[0], Decimal("4.00"))
+
+    def test_nearest_category_beats_ancestor(self):
+        index = ScheduleIndex([
+            rule((0, 0), (23, 59), category_id=self.beer, price="6.00"),
+            rule((0, 0), (23, 59), category_id=self.drinks, price="8.00"),
+        ], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 12))[0], Decimal("6.00"))
+        # stavka direktno u roditeljskoj kategoriji dobija samo njeno pravilo
+        self.assertEqual(self.state(index, at(MONDAY, 12), category_id=self.drinks)[0], Decimal("8.00"))
+
+    def test_ancestor_rule_applies_to_subtree(self):
+        index = ScheduleIndex([rule((0, 0), (23, 59), category_id=self.drinks, discount="10")], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 12))[0], Decimal("9.00"))
+
+    def test_later_rule_wins_on_same_target(self):
+        first = rule((0, 0), (23, 59), item_id=self.item, price="4.00")
+        second = rule((0, 0), (23, 59), item_id=self.item, price="5.00")
+        index = ScheduleIndex([second, first], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 12))[0], Decimal("5.00"))
+
+    def test_rule_cannot_make_unavailable_item_available(self):
+        index = ScheduleIndex([rule((0, 0), (23, 59), item_id=self.item, available=True)], 1)
+        self.assertEqual(self.state(index, at(MONDAY, 12), available=False)[1], False)
+
+
+class MinuteOfWeekTests(SimpleTestCase):
+    @override_settings(VENUE_TIME_ZONE="Europe/Belgrade")
+    def test_uses_venue_time_zone(self):
+        # ponedeljak 15:00 UTC je 17:00 u Beogradu (letnje vreme)
+        moment = datetime(2025, 7, 7, 15, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(minute_of_week(moment), at(MONDAY, 17))
+
+    @override_settings(VENUE_TIME_ZONE="Europe/Belgrade")
+    def test_winter_offset(self):
+        moment = datetime(2025, 1, 6, 16, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(minute_of_week(moment), at(MONDAY, 17))
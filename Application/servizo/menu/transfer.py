@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from asgiref.sync import sync_to_async
+from bson import ObjectId
+from .models import MenuCategory, MenuItem
+from .snapshot import invalidate_menu
+from .tree import category_index, categories_changed
+
+EXPORT_FIELDS = ["category", "name", "price", "available", "description"]
+TRUE_VALUES = {"1", "true", "yes", "y", "da"}
+
+
+def detect_format(filename, default="csv"):
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def iter_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+        return
+
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def _parse_available(value):
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+class MenuImporter:
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        index = category_index()
+        self.category_ids = {path: node.id for path, node in index.by_path.items()}
+        self.ancestors = {node.id: list(node.ancestors) for node in index.nodes.values()}
+        self.new_categories = []
+        self.pending_categories = []
+        self.pending_items = []
+        self.created_items = 0
+        self.errors = []
+
+    def _resolve_category(self, path):
+        segments = [s.strip() for s in path.split("/") if s.strip()]
+        if not segments:
+            raise ValueError("Category path is required")
+
+        parent_id = None
+        current = None
+        for name in segments:
+            if len(name) > MenuCategory._meta.get_field("name").max_length:
+                raise ValueError(f"Category name '{name}' is too long")
+
+            current = f"{current}/{name}" if current else name
+            category_id = self.category_ids.get(current)
+            if category_id is None:
+                # kategorije koje ne postoje pravimo u memoriji, upisuju se sa sledecim batch-om
+                ancestors = self.ancestors[parent_id] + [parent_id] if parent_id else []
+                category = MenuCategory(id=ObjectId(), name=name, parent=parent_id, path=current, ancestors=ancestors)
+                self.pending_categories.append(category)
+                self.category_ids[current] = category_id = category.id
+                self.ancestors[category_id] = ancestors
+            parent_id = category_id
+        return parent_id
+
+    def add(self, line_no, row):
+        if row is None:
+            self.errors.append({"row": line_no, "error": "Malformed row"})
+            return
+
+        try:
+            name = (row.get("name") or "").strip()
+            if not name:
+                raise ValueError("Field 'name' is required")
+            if len(name) > MenuItem._meta.get_field("name").max_length:
+                raise ValueError("Field 'name' is too long")
+
+            try:
+                price = Decimal(str(row.get("price")))
+            except InvalidOperation:
+                raise ValueError("Invalid 'price' format")
+            if not price.is_finite() or price < 0:
+                raise ValueError("Price must be non-negative")
+
+            category_id = self._resolve_category(str(row.get("category") or ""))
+        except ValueError as e:
+            self.errors.append({"row": line_no, "error": str(e)})
+            return
+
+        self.pending_items.append(MenuItem(
+            name=name,
+            category_id=category_id,
+            price=price,
+            available=_parse_available(row.get("available")),
+            description=row.get("description") or None,
+        ))
+        if len(self.pending_items) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending_categories:
+            MenuCategory.objects.bulk_create(self.pending_categories)
+            self.new_categories.extend(self.pending_categories)
+            self.pending_categories = []
+        if self.pending_items:
+            MenuItem.objects.bulk_create(self.pending_items)
+            self.created_items += len(self.pending_items)
+            self.pending_items = []
+
+    def finish(self):
+        self.flush()
+        if self.new_categories:
+            categories_changed(self.new_categories)
+        if self.new_categories or self.created_items:
+            invalidate_menu()
+
+        return {
+            "created_categories": len(self.new_categories),
+            "created_items": self.created_items,
+            "errors": self.errors,
+        }
+
+
+def import_menu(stream, fmt, batch_size=500):
+    importer = MenuImporter(batch_size)
+    # red 1 je zaglavlje kod CSV-a
+    start = 2 if fmt == "csv" else 1
+    for line_no, row in enumerate(iter_rows(stream, fmt), start=start):
+        importer.add(line_no, row)
+    return importer.finish()
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_menu(fmt, chunk_size=500):
+    index = category_index()
+    writer = csv.writer(_Echo())
+
+    if fmt == "csv":
+        yield writer.writerow(EXPORT_FIELDS)
+
+    # iterator() cita preko server-side kursora, pa ceo katalog nikad nije u memoriji
+    items = MenuItem.objects.order_by("category_id", "name").iterator(chunk_size=chunk_size)
+    for item in items:
+        row = {
+            "category": index.path(item.category_id),
+            "name": item.name,
+            "price": str(item.price),
+            "available": item.available,
+            "description": item.description,
+        }
+        if fmt == "csv":
+            row["available"] = "true" if item.available else "false"
+            yield writer.writerow([row[f] if row[f] is not None else "" for f in EXPORT_FIELDS])
+        else:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+async def aexport_menu(fmt, chunk_size=500):
+    # pod ASGI-jem Django sinhroni iterator prvo procita do kraja (sync_to_async(list)),
+    # pa se redovi uzimaju u paketima; generator (i njegov kursor) ostaje na istom thread-u
+    rows = export_menu(fmt, chunk_size)
+    next_batch = sync_to_async(lambda: list(islice(rows, chunk_size)), thread_sensitive=True)
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        yield "".join(batch)
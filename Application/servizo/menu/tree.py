@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from helpers.counters import bump_counter, get_counter
+
+CATEGORIES_VERSION_COUNTER = "menu_categories"
+
+
+class CategoryNode:
+    __slots__ = ("id", "name", "parent", "path", "ancestors", "station")
+
+    def __init__(self, id, name, parent, path, ancestors, station=None):
+        self.id = id
+        self.name = name
+        self.parent = parent
+        self.path = path
+        self.ancestors = tuple(ancestors or ())
+        self.station = station
+
+
+class CategoryIndex:
+    def __init__(self, categories, version):
+        self.version = version
+        self.nodes = {}
+        self.children = defaultdict(list)
+        self.by_path = {}
+        self._stations = None
+        self._ordered = None
+        for c in categories:
+            self._put(c)
+
+    def _put(self, c):
+        node = CategoryNode(c.id, c.name, c.parent, c.path, c.ancestors, c.station)
+        self.nodes[node.id] = node
+        self.by_path[node.path] = node
+        self.children[node.parent].append(node.id)
+
+    def _drop(self, category_id):
+        node = self.nodes.pop(category_id, None)
+        if node is None:
+            return
+        if self.by_path.get(node.path) is node:
+            del self.by_path[node.path]
+        siblings = self.children.get(node.parent)
+        if siblings and category_id in siblings:
+            siblings.remove(category_id)
+
+    def patched(self, version, categories=(), removed=()):
+        # citaoci iteriraju nodes/children bez lock-a, pa se menja kopija koja se zatim zamenjuje
+        index = CategoryIndex((), version)
+        index.nodes = dict(self.nodes)
+        index.by_path = dict(self.by_path)
+        index.children = defaultdict(list, {k: list(v) for k, v in self.children.items()})
+        index.patch(categories, removed)
+        return index
+
+    def patch(self, categories=(), removed=()):
+        self._stations = None
+        self._ordered = None
+        for category_id in removed:
+            self._drop(category_id)
+        for c in categories:
+            self._drop(c.id)
+            self._put(c)
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def name(self, category_id):
+        node = self.nodes.get(category_id)
+        return node.name if node else None
+
+    def path(self, category_id):
+        node = self.nodes.get(category_id)
+        return node.path if node else None
+
+    def ancestors(self, category_id):
+        node = self.nodes.get(category_id)
+        return node.ancestors if node else ()
+
+    def station(self, category_id):
+        from .models import Station
+
+        # mapa kategorija -> stanica se racuna jednom po verziji indeksa
+        if self._stations is None:
+            stations = {}
+            for node in sorted(self.nodes.values(), key=lambda n: len(n.ancestors)):
+                inherited = stations.get(node.parent, Station.KITCHEN)
+                stations[node.id] = node.station or inherited
+            self._stations = stations
+        return self._stations.get(category_id, Station.KITCHEN)
+
+    def ordered(self):
+        # kategorije sortirane po putanji, racuna se jednom po verziji indeksa
+        if self._ordered is None:
+            self._ordered = sorted(self.nodes.values(), key=lambda n: n.path)
+        return self._ordered
+
+    def by_name(self, name):
+        # imena nisu jedinstvena, vraca prvu kategoriju sa najkracom putanjom
+        matches = [n for n in self.nodes.values() if n.name == name]
+        return min(matches, key=lambda n: len(n.ancestors)) if matches else None
+
+    def descendants(self, category_id):
+        result = []
+        stack = list(self.children.get(category_id, ()))
+        while stack:
+            cid = stack.pop()
+            result.append(cid)
+            stack.extend(self.children.get(cid, ()))
+        return result
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _load(version):
+    from .models import MenuCategory
+    categories = MenuCategory.objects.only("id", "name", "parent", "path", "ancestors", "station")
+    return CategoryIndex(categories, version)
+
+
+def category_index(fresh=False) -> CategoryIndex:
+    # fresh=True za upise: verzija se uvek proverava, jer indeks drugog workera
+    # moze da kasni do CATEGORY_INDEX_REFRESH_SECONDS
+    global _index, _checked_at
+
+    now = time.monotonic()
+    if not fresh and _index is not None and now - _checked_at < settings.CATEGORY_INDEX_REFRESH_SECONDS:
+        return _index
+
+    with _lock:
+        version = get_counter(CATEGORIES_VERSION_COUNTER)
+        if _index is None or _index.version != version:
+            _index = _load(version)
+        _checked_at = now
+        return _index
+
+
+def categories_changed(categories=(), removed=()):
+    global _index
+
+    version = bump_counter(CATEGORIES_VERSION_COUNTER)
+    with _lock:
+        if _index is not None and _index.version == version - 1:
+            _index = _index.patched(version, categories, removed)
+        else:
+            # neki drugi worker je upisivao u medjuvremenu, indeks se ucitava iz pocetka
+            _index = None
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+get_menu_items = views.aget_menu_items if settings.ASYNC_VIEWS else views.get_menu_items
+
 urlpatterns = [
     path('categories/', views.get_categories, name="get-categories"),
     path('categories/add/', views.add_category, name="add-category"),
@@ -8,10 +11,21 @@ urlpatterns = [
     path('categories/<str:category_id>/delete/', views.remove_category, name="delete-category"),
 
     # lista svih stavki menija
-    path('items/', views.get_menu_items, name="get-menu-items"),
+    path('items/', get_menu_items, name="get-menu-items"),
+    path('items/page/', views.get_menu_items_page, name="get-menu-items-page"),
+    path('changes/', views.get_menu_changes, name="get-menu-changes"),
+    path('search/', views.search_menu, name="search-menu"),
     path('items/add/', views.add_menu_item, name="add-menu-item"),
+    path('items/import/', views.import_menu_items, name="import-menu-items"),
+    path('items/export/', views.export_menu_items, name="export-menu-items"),
+    path('items/availability/', views.set_availability, name="set-items-availability"),
     path('items/by-category/<str:category_id>/', views.get_items_by_category, name="get-category-items"),
     path('items/<str:item_id>/update/', views.update_item, name="update-menu-item"),
     path('items/<str:item_id>/price/', views.update_price, name="update-item-price"),
     path('items/<str:item_id>/delete/', views.remove_item, name="delete-menu-item"),
+
+    # raspored cena i dostupnosti (happy hour)
+    path('schedules/', views.get_schedules, name="get-schedules"),
+    path('schedules/add/', views.add_schedule, name="add-schedule"),
+    path('schedules/<str:schedule_id>/delete/', views.remove_schedule, name="delete-schedule"),
 ]
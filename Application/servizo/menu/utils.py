@@ -1,13 +1,40 @@
-from .models import MenuCategory
+import base64
+import json
+from bisect import bisect_left
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from pymongo import UpdateOne
+from bson import ObjectId
+from bson.errors import InvalidId
+from .models import MenuCategory, MenuItem, MenuTombstone
+from .tree import category_index
+from .schedules import apply_schedule, schedule_index, schedules_version
+from .snapshot import serialize_menu_item
 
 def get_parent_path(pid):
     if not pid:
         return None
-    return MenuCategory.objects.only("path").get(id=pid).path
+    return category_index().path(pid)
+
+def _bulk_save_paths(descendants, fields):
+    now = timezone.now()
+    ops = [
+        UpdateOne({"_id": d.id}, {"$set": {**{f: getattr(d, f) for f in fields}, "last_updated": now}})
+        for d in descendants
+    ]
+    if ops:
+        connection.get_collection(MenuCategory._meta.db_table).bulk_write(ops, ordered=False)
 
 def reparent_descendants_for_delete(descendants, category):
+    # roditelj obrisane kategorije ostaje isti, pa mu je putanja prefiks putanje kategorije
     new_parent_id = category.parent
     path_by_id = {}
+    if new_parent_id:
+        path_by_id[new_parent_id] = category.path.rsplit("/", 1)[0]
 
     descendants.sort(key=lambda d: len(d.ancestors))
 
@@ -17,16 +44,15 @@ def reparent_descendants_for_delete(descendants, category):
         if d.parent == category.id:
             d.parent = new_parent_id
 
-        parent_path = None
-        if d.parent:
-            parent_path = MenuCategory.objects.only("path").get(id=d.parent).path
-
+        parent_path = path_by_id.get(d.parent)
         d.path = f"{parent_path}/{d.name}" if parent_path else d.name
-
-        d.save(update_fields=["ancestors", "parent", "path"])
         path_by_id[d.id] = d.path
 
+    _bulk_save_paths(descendants, ["ancestors", "parent", "path"])
+
 def reparent_descendants_for_update(descendants, category):
+    path_by_id = {category.id: category.path}
+
     descendants.sort(key=lambda d: len(d.ancestors))
 
     for d in descendants:
@@ -35,6 +61,147 @@ def reparent_descendants_for_update(descendants, category):
             tail = d.ancestors[i+1:]
             d.ancestors = list(category.ancestors) + [category.id] + tail
 
-        parent_path = get_parent_path(d.parent)
+        parent_path = path_by_id.get(d.parent)
         d.path = f"{parent_path}/{d.name}" if parent_path else d.name
-        d.save(update_fields=["ancestors", "path"])
\ No newline at end of file
+        path_by_id[d.id] = d.path
+
+    _bulk_save_paths(descendants, ["ancestors", "path"])
+
+PAGE_FIELDS = ("name", "category", "category_id", "price", "available", "description", "last_updated")
+
+def encode_cursor(path, name, item_id):
+    raw = json.dumps([path, name, str(item_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor):
+    try:
+        path, name, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return path, name, ObjectId(item_id)
+    except (ValueError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+def menu_items_page(after=None, limit=50, fields=PAGE_FIELDS):
+    # redosled (putanja kategorije, naziv, _id); putanja nije u dokumentu stavke, pa se kategorije
+    # obilaze redom iz indeksa i svaka se cita preko indeksa (category_id, name, _id)
+    index = category_index()
+    ordered = index.ordered()
+    paths = [n.path for n in ordered]
+
+    start, resume = 0, None
+    if after:
+        path, name, item_id = after
+        start = bisect_left(paths, path)
+        if start < len(paths) and paths[start] == path:
+            resume = {"$or": [{"name": {"$gt": name}}, {"name": name, "_id": {"$gt": item_id}}]}
+
+    projection = {"name": 1, "category_id": 1}
+    projection.update({f: 1 for f in fields if f != "category"})
+
+    items_collection = connection.get_collection(MenuItem._meta.db_table)
+    rows = []
+    for pos in range(start, len(ordered)):
+        query = {"category_id": ordered[pos].id}
+        if pos == start and resume:
+            query.update(resume)
+        cursor = items_collection.find(query, projection).sort([("name", 1), ("_id", 1)])
+        for row in cursor.limit(limit + 1 - len(rows)):
+            row["_path"] = ordered[pos].path
+            rows.append(row)
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["_path"], last["name"], last["_id"])
+
+    schedules = schedule_index()
+    segment = schedules.segment()
+
+    items = []
+    for row in rows:
+        price = row["price"].to_decimal() if "price" in row else None
+        row["price"], row["available"] = schedules.resolve(
+            segment, row["_id"], row["category_id"], price, row.get("available", True))
+        item = {"id": str(row["_id"])}
+        for f in fields:
+            if f == "category":
+                item[f] = index.name(row["category_id"])
+            elif f == "category_id":
+                item[f] = str(row["category_id"])
+            elif f == "price":
+                item[f] = str(row["price"]) if row.get("price") is not None else None
+            else:
+                item[f] = row.get(f)
+        items.append(item)
+
+    return items, next_cursor
+
+
+def add_tombstones(kind, ids):
+    if ids:
+        MenuTombstone.objects.bulk_create([MenuTombstone(kind=kind, object_id=i) for i in ids])
+
+def changes_token(version, rules_version, segment):
+    return f"{version}-{rules_version}-{segment}"
+
+
+def parse_changes_token(token):
+    try:
+        version, rules_version, segment = (int(p) for p in token.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return version, rules_version, segment
+
+
+def menu_changes(since, known=None):
+    # upisi koji su bili u toku dok citamo mogu imati stariji last_updated,
+    # pa sledeci 'since' malo preklapa prethodni; klijent ionako radi upsert
+    now = timezone.now()
+    index = category_index()
+    # verzija pravila pre indeksa: izmena izmedju dva citanja stize sa sledecom sinhronizacijom
+    rules_version = schedules_version()
+    schedules = schedule_index()
+    segment = schedules.segment()
+
+    # cene i dostupnost zavise i od pravila i od segmenta nedelje, ne samo od last_updated
+    query = Q(last_updated__gt=since)
+    if known is None or known[1] != rules_version or not 0 <= known[2] < len(schedules.segments):
+        # pravila su dodata/obrisana (ili ih klijent ne zna), saljemo sve stavke sa trenutnim cenama
+        query = Q()
+    elif known[2] != segment:
+        item_ids, category_ids = set(), set()
+        for seg in (known[2], segment):
+            items, categories = schedules.targets(seg)
+            item_ids |= items
+            category_ids |= categories
+        for category_id in list(category_ids):
+            category_ids.update(index.descendants(category_id))
+        query |= Q(id__in=item_ids) | Q(category_id__in=category_ids)
+
+    items = []
+    for item in MenuItem.objects.filter(query):
+        data = json.loads(json.dumps(serialize_menu_item(item, index), cls=DjangoJSONEncoder))
+        items.append(apply_schedule(data, schedules, segment))
+
+    categories = [{
+        "id": str(c.id),
+        "name": c.name,
+        "path": c.path,
+        "parent": str(c.parent) if c.parent else None,
+    } for c in MenuCategory.objects.filter(last_updated__gt=since)]
+
+    deleted = {MenuTombstone.ITEM: [], MenuTombstone.CATEGORY: []}
+    for kind, object_id in MenuTombstone.objects.filter(deleted_at__gt=since).values_list("kind", "object_id"):
+        deleted.setdefault(kind, []).append(str(object_id))
+
+    return {
+        "since": (now - timedelta(seconds=settings.MENU_CHANGES_OVERLAP_SECONDS)).isoformat(),
+        "rules_version": rules_version,
+        "segment": segment,
+        "items": items,
+        "categories": categories,
+        "deleted_items": deleted[MenuTombstone.ITEM],
+        "deleted_categories": deleted[MenuTombstone.CATEGORY],
+    }
@@ -1,10 +1,29 @@
-from django.views.decorators.http import require_POST, require_GET, require_safe, require_http_methods
+from django.views.decorators.http import require_POST, require_GET, require_safe, require_http_methods, etag
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.cache import cache_control
 from helpers.responses import bad_request, created_response, not_found, success
-from .models import MenuItem, MenuCategory
-from .utils import reparent_descendants_for_delete, reparent_descendants_for_update
+from .models import MenuItem, MenuCategory, MenuSchedule, MenuTombstone, Station
+from .utils import get_parent_path, reparent_descendants_for_delete, reparent_descendants_for_update
+from .utils import PAGE_FIELDS, decode_cursor, menu_items_page, add_tombstones, menu_changes
+from .utils import changes_token, parse_changes_token
+from .snapshot import invalidate_menu, menu_etag, menu_version, MENU_VERSION_COUNTER
+from .schedules import apply_schedule, get_scheduled_snapshot, schedule_index
+from .schedules import cached_schedule_index, scheduled_snapshot_key, schedules_changed, schedules_version
+from .search import search_index
+from .transfer import detect_format, export_menu, aexport_menu, import_menu
+from .tree import category_index, categories_changed
 from helpers.utils import parse_json
-from django.http import JsonResponse
+from helpers.counters import aget_counter
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_time
+from datetime import timedelta, timezone as dt_timezone
 from decimal import Decimal
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -21,6 +40,9 @@ def add_category(request):
 
     name = data.get("name")
     parent_id = data.get("parent_id")
+    station = data.get("station") or None
+    if station is not None and station not in Station.values:
+        return bad_request(f"Invalid 'station', expected one of {', '.join(Station.values)}")
 
     parent = None
     ancestors = []
@@ -29,14 +51,19 @@ def add_category(request):
     if parent_id:
         try:
             parent_id = ObjectId(parent_id)
-            parent = MenuCategory.objects.get(id=parent_id)
-            ancestors = parent.ancestors + [parent.id]
-            path = f"{parent.path}/{name}"
-        except MenuCategory.DoesNotExist:
+        except (InvalidId, TypeError):
+            return bad_request("Invalid 'parent_id'")
+
+        parent = category_index(fresh=True).get(parent_id)
+        if parent is None:
             return not_found("Parent category not found")
+        ancestors = list(parent.ancestors) + [parent.id]
+        path = f"{parent.path}/{name}"
 
     category = MenuCategory.objects.create(
-        name=name, parent=parent_id, path=path, ancestors=ancestors)
+        name=name, parent=parent_id, path=path, ancestors=ancestors, station=station)
+    categories_changed([category])
+    invalidate_menu()
     return created_response("Category added", id=str(category.id))
 
 
@@ -52,8 +79,11 @@ def add_menu_item(request):
     description = data.get("description", None)
 
     try:
-        category = MenuCategory.objects.get(id=ObjectId(category_id))
-    except MenuCategory.DoesNotExist:
+        category = category_index(fresh=True).get(ObjectId(category_id))
+    except (InvalidId, TypeError):
+        return bad_request("Invalid 'category_id'")
+
+    if category is None:
         return not_found("Category not found")
 
     item = MenuItem.objects.create(
@@ -62,23 +92,136 @@ def add_menu_item(request):
         price=price,
         description=description
     )
+    invalidate_menu(items=[item])
     return created_response("Menu_item added", id=str(item.id))
 
 
 @require_safe
+@cache_control(no_cache=True)
+@etag(menu_etag)
 def get_menu_items(request):
-    items = MenuItem.objects.all()
-    data = [{
-        "id": str(i.id),
-        "name": i.name,
-        "category": i.category_name,
-        "category_id": str(i.category_id),
-        "price": str(i.price),
-        "available": i.available,
-        "description": i.description,
-        "last_updated": i.last_updated,
-    } for i in items]
-    return JsonResponse(data, safe=False)
+    body = get_scheduled_snapshot(request.menu_version, request.menu_segment)
+    return HttpResponse(body, content_type="application/json")
+
+
+@require_safe
+@cache_control(no_cache=True)
+async def aget_menu_items(request):
+    # isto kao get_menu_items, ali verzija ide preko async drajvera,
+    # a snapshot se pravi van event loop-a samo kad ga nema u kesu
+    version = await aget_counter(MENU_VERSION_COUNTER)
+    index = cached_schedule_index(version) or await sync_to_async(schedule_index)(version)
+    segment = index.segment()
+
+    etag = quote_etag(f"menu-{version}-{segment}")
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = await cache.aget(scheduled_snapshot_key(version, segment))
+        if body is None:
+            body = await sync_to_async(get_scheduled_snapshot)(version, segment)
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return response
+
+
+@require_GET
+def get_menu_items_page(request):
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+    except ValueError:
+        return bad_request("Invalid 'limit'")
+
+    fields = PAGE_FIELDS
+    if request.GET.get("fields"):
+        fields = tuple(f.strip() for f in request.GET["fields"].split(",") if f.strip())
+        unknown = set(fields) - set(PAGE_FIELDS)
+        if unknown:
+            return bad_request(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    after = None
+    if request.GET.get("cursor"):
+        try:
+            after = decode_cursor(request.GET["cursor"])
+        except ValueError:
+            return bad_request("Invalid 'cursor'")
+
+    items, next_cursor = menu_items_page(after, limit, fields)
+    return JsonResponse({"items": items, "next": next_cursor})
+
+
+@require_auth
+@csrf_protect
+@require_POST
+def import_menu_items(request):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return bad_request("File field 'file' is required")
+
+    fmt = request.GET.get("format") or detect_format(upload.name)
+    if fmt not in ("csv", "jsonl"):
+        return bad_request("Format must be 'csv' or 'jsonl'")
+
+    try:
+        report = import_menu(upload.file, fmt)
+    except UnicodeDecodeError:
+        return bad_request("File must be UTF-8 encoded")
+
+    return created_response("Menu imported", **report)
+
+
+@require_auth
+@require_GET
+def export_menu_items(request):
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "jsonl"):
+        return bad_request("Format must be 'csv' or 'jsonl'")
+
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    # ASGI zahteva async iterator da bi se odgovor slao u delovima, WSGI sinhroni
+    rows = aexport_menu(fmt) if isinstance(request, ASGIRequest) else export_menu(fmt)
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="menu.{fmt}"'
+    return response
+
+
+@require_GET
+def get_menu_changes(request):
+    # verzija menija, verzija pravila i segment nedelje; happy hour menja cene bez upisa u meni
+    version = menu_version()
+    token = changes_token(version, schedules_version(), schedule_index(version).segment())
+    client_version = request.GET.get("version")
+    if client_version and client_version == token:
+        return HttpResponseNotModified()
+
+    since = parse_datetime(request.GET.get("since", ""))
+    if since is None:
+        return bad_request("Query parameter 'since' must be an ISO timestamp")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+
+    if since < timezone.now() - timedelta(days=MenuTombstone.RETENTION_DAYS):
+        return bad_request("'since' is too old, fetch the full menu", status=410)
+
+    data = menu_changes(since, parse_changes_token(client_version))
+    data["version"] = changes_token(version, data.pop("rules_version"), data.pop("segment"))
+    return JsonResponse(data)
+
+
+@require_GET
+def search_menu(request):
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return bad_request("Query parameter 'q' is required")
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+    except ValueError:
+        return bad_request("Invalid 'limit'")
+
+    schedules = schedule_index()
+    segment = schedules.segment()
+    results = [apply_schedule(i, schedules, segment) for i in search_index().search(query, limit)]
+    return JsonResponse(results, safe=False)
 
 
 @require_GET
@@ -88,26 +231,39 @@ def get_categories(request):
         "id": str(c.id),
         "name": c.name,
         "path": c.path,
-        "parent": str(c.parent) if c.parent else None
+        "parent": str(c.parent) if c.parent else None,
+        "station": c.station,
     } for c in categories]
     return JsonResponse(data, safe=False)
 
 
-@require_GET  # by name, change later by id
-def get_items_by_category(request, category_name: str):
-    try:
-        category = MenuCategory.objects.get(name=category_name)
-    except MenuItem.DoesNotExist:
+@require_GET
+def get_items_by_category(request, category_id: str):
+    index = category_index()
+    category = index.get(ObjectId(category_id)) if ObjectId.is_valid(category_id) else index.by_name(category_id)
+    if category is None:
         return not_found("Category not found")
 
-    items = MenuItem.objects.filter(category_id=category.id)
+    # cela podstabla u jednom $in upitu, grupisano po putanji kategorije
+    category_ids = [category.id] + index.descendants(category.id)
+    groups = {cid: [] for cid in category_ids}
+
+    items = MenuItem.objects.filter(category_id__in=category_ids).order_by("name")
+    for i in items:
+        groups[i.category_id].append({
+            "id": str(i.id),
+            "name": i.name,
+            "price": str(i.price),
+            "description": i.description,
+            "available": i.available,
+        })
+
     data = [{
-        "id": str(i.id),
-        "name": i.name,
-        "price": str(i.price),
-        "description": i.description,
-        "available": i.available,
-    } for i in items]
+        "category_id": str(cid),
+        "category": index.name(cid),
+        "path": index.path(cid),
+        "items": groups[cid],
+    } for cid in sorted(category_ids, key=index.path)]
     return success(data)
 
 @csrf_protect
@@ -141,7 +297,8 @@ def update_price(request, item_id: str):
         return not_found("Item not found")
 
     item.price = dec_price
-    item.save(update_fields=["price"])
+    item.save(update_fields=["price", "last_updated"])
+    invalidate_menu(items=[item])
 
     return success(f"Price for item {item.id} updated to {item.price}")
 
@@ -165,38 +322,54 @@ def update_category(request, category_id: str):
         cat.name = new_name
         fields.append("name")
 
-    descendants = None
     new_pid = data.get("parent_id")
     if new_pid:
         try:
             new_pid = ObjectId(new_pid)
-            new_parent = MenuCategory.objects.get(id=new_pid)
         except InvalidId:
             return bad_request("Invalid category_id")
-        
-        old_prefix = f"{cat.path}/"
-        descendants = list(MenuCategory.objects.filter(path__startswith=old_prefix))
 
-        if new_parent.path.startswith(old_prefix):
-                return bad_request("Cannot move under own subtree")
+        # provera ciklusa mora da vidi poteze koje su upravo uradili drugi workeri
+        new_parent = category_index(fresh=True).get(new_pid)
+        if new_parent is None:
+            return not_found("Parent category not found")
+
+        if new_parent.id == cat.id or cat.id in new_parent.ancestors:
+            return bad_request("Cannot move under own subtree")
             
         if cat.parent != new_parent.id:
-                cat.parent = new_parent.id
-                cat.ancestors = list(new_parent.ancestors) + [new_parent.id]
-                fields.extend(["parent", "ancestors"])
+            cat.parent = new_parent.id
+            cat.ancestors = list(new_parent.ancestors) + [new_parent.id]
+            fields.extend(["parent", "ancestors"])
             
-    parent_path = MenuCategory.objects.only("path").get(id=cat.parent).path if cat.parent else None
+    if "station" in data:
+        station = data["station"] or None
+        if station is not None and station not in Station.values:
+            return bad_request(f"Invalid 'station', expected one of {', '.join(Station.values)}")
+        if station != cat.station:
+            cat.station = station
+            fields.append("station")
+
+    parent_path = get_parent_path(cat.parent)
     new_path = f"{parent_path}/{cat.name}" if parent_path else cat.name
     if new_path != cat.path:
         cat.path = new_path
         fields.append("path")
 
-    if fields:
-        cat.save(update_fields=fields)
+    if not fields:
+        return success(f"Category {cat.name} unchanged")
 
-    if descendants and fields:
+    cat.save(update_fields=fields + ["last_updated"])
+
+    # cela podstabla se citaju jednom i upisuju jednim bulk_write-om
+    descendants = []
+    if "path" in fields:
+        descendants = list(cat.descendants)
         reparent_descendants_for_update(descendants, cat)
 
+    categories_changed([cat] + descendants)
+    invalidate_menu()
+
     return success(f"Category {cat.name} updated")
 
 
@@ -242,15 +415,53 @@ def update_item(request, item_id: str):
             except (InvalidId, TypeError):
                 return bad_request("Invalid 'category_id'")
 
-            if not MenuCategory.objects.filter(id=new_cid).exists():
+            if category_index(fresh=True).get(new_cid) is None:
                 return not_found("Target category not found")
             
             item.category_id = new_cid
             fields.append("category_id")
 
+    if fields:
+        fields.append("last_updated")
     item.save(update_fields=fields)
+    invalidate_menu(items=[item])
     return success(f"Item {item.id} updated")
 
+@require_auth
+@csrf_protect
+@require_POST
+def set_availability(request):
+    data = parse_json(request)
+    if data is None:
+        return bad_request("Invalid JSON body")
+
+    available = data.get("available")
+    if not isinstance(available, bool):
+        return bad_request("Field 'available' must be true or false")
+
+    try:
+        item_ids = [ObjectId(i) for i in data.get("item_ids") or []]
+        category_id = ObjectId(data["category_id"]) if data.get("category_id") else None
+    except (InvalidId, TypeError):
+        return bad_request("Invalid 'item_ids' or 'category_id'")
+
+    query = Q(id__in=item_ids) if item_ids else Q()
+    if category_id:
+        index = category_index(fresh=True)
+        if index.get(category_id) is None:
+            return not_found("Category not found")
+        subtree = Q(category_id__in=[category_id] + index.descendants(category_id))
+        query = query | subtree if item_ids else subtree
+    elif not item_ids:
+        return bad_request("Provide 'item_ids' and/or 'category_id'")
+
+    # jedan update_many za sve stavke, verzija menija se podize samo jednom
+    updated = MenuItem.objects.filter(query).update(available=available, last_updated=timezone.now())
+    version = invalidate_menu()
+
+    return JsonResponse({"detail": f"{updated} items updated", "updated": updated, "version": version})
+
+
 @csrf_protect
 @require_http_methods(["DELETE"])
 def remove_category(request, category_id: str):
@@ -264,15 +475,21 @@ def remove_category(request, category_id: str):
     except MenuCategory.DoesNotExist:
         return not_found("Category doesn't exist")
 
-    old_prefix = f"{category.path}/"
-    descendants = list(MenuCategory.objects.filter(path__startswith=old_prefix))
+    descendants = list(category.descendants)
 
     if descendants:
         reparent_descendants_for_delete(descendants, category)
 
-    MenuItem.objects.filter(category_id=category.id).delete()
+    item_ids = list(MenuItem.objects.filter(category_id=category.id).values_list("id", flat=True))
+    if item_ids:
+        MenuItem.objects.filter(id__in=item_ids).delete()
 
     category.delete()
+    add_tombstones(MenuTombstone.CATEGORY, [category_oid])
+    add_tombstones(MenuTombstone.ITEM, item_ids)
+
+    categories_changed(descendants, removed=[category_oid])
+    invalidate_menu(removed=item_ids)
     return success(f"Category {category_id} deleted and descendants reparented.")
 
 @csrf_protect
@@ -280,7 +497,11 @@ def remove_category(request, category_id: str):
 def remove_item(request, item_id: str):
     try:
         item = MenuItem.objects.get(id=item_id)
+        # delete() postavlja pk na None, id uzimamo pre brisanja
+        item_oid = item.id
         item.delete()
+        add_tombstones(MenuTombstone.ITEM, [item_oid])
+        invalidate_menu(removed=[item_oid])
 
         return success(f"Menu item {item_id} deleted.")
     except MenuItem.DoesNotExist:
@@ -301,8 +522,116 @@ def set_unavailable(request, item_id: str):
         return not_found("Menu item not found!")
 
     item.available = False
-    item.save(update_fields=['available'])
+    item.save(update_fields=['available', 'last_updated'])
+    invalidate_menu(items=[item])
 
     return success(f"{item_id} set to unavailable")
 
+def serialize_schedule(rule):
+    return {
+        "id": str(rule.id),
+        "name": rule.name,
+        "item_id": str(rule.item_id) if rule.item_id else None,
+        "category_id": str(rule.category_id) if rule.category_id else None,
+        "weekdays": rule.weekdays,
+        "start_time": rule.start_time.strftime("%H:%M"),
+        "end_time": rule.end_time.strftime("%H:%M"),
+        "price": str(rule.price) if rule.price is not None else None,
+        "discount_percent": str(rule.discount_percent) if rule.discount_percent is not None else None,
+        "available": rule.available,
+    }
+
+
+@require_GET
+def get_schedules(request):
+    return JsonResponse([serialize_schedule(r) for r in MenuSchedule.objects.all()], safe=False)
+
+
+@require_auth
+@csrf_protect
+@require_POST
+def add_schedule(request):
+    data = parse_json(request)
+    if data is None:
+        return bad_request("Invalid JSON body")
+
+    name = (data.get("name") or "").strip()
+    if not name:
+        return bad_request("Field 'name' is required")
+
+    try:
+        item_id = ObjectId(data["item_id"]) if data.get("item_id") else None
+        category_id = ObjectId(data["category_id"]) if data.get("category_id") else None
+    except (InvalidId, TypeError):
+        return bad_request("Invalid 'item_id' or 'category_id'")
+
+    if (item_id is None) == (category_id is None):
+        return bad_request("Exactly one of 'item_id' and 'category_id' is required")
+    if item_id and not MenuItem.objects.filter(id=item_id).exists():
+        return not_found("Item not found")
+    if category_id and category_index(fresh=True).get(category_id) is None:
+        return not_found("Category not found")
+
+    weekdays = data.get("weekdays") or []
+    if not isinstance(weekdays, list) or any(d not in range(7) for d in weekdays):
+        return bad_request("'weekdays' must be a list of numbers 0 (Monday) to 6 (Sunday)")
+
+    try:
+        start_time = parse_time(str(data.get("start_time")))
+        end_time = parse_time(str(data.get("end_time")))
+    except ValueError:
+        start_time = end_time = None
+    if start_time is None or end_time is None:
+        return bad_request("Fields 'start_time' and 'end_time' must be HH:MM")
+
+    try:
+        price = Decimal(str(data["price"])) if data.get("price") is not None else None
+        discount = Decimal(str(data["discount_percent"])) if data.get("discount_percent") is not None else None
+    except Exception:
+        return bad_request("Invalid 'price' or 'discount_percent' format")
+
+    if price is not None and price < 0:
+        return bad_request("Price must be non-negative")
+    if discount is not None and not (0 <= discount <= 100):
+        return bad_request("Discount must be between 0 and 100")
+
+    available = data.get("available")
+    if available is not None and not isinstance(available, bool):
+        return bad_request("Field 'available' must be true or false")
+    if price is None and discount is None and available is None:
+        return bad_request("Provide 'price', 'discount_percent' or 'available'")
+
+    rule = MenuSchedule.objects.create(
+        name=name,
+        item_id=item_id,
+        category_id=category_id,
+        weekdays=sorted(set(weekdays)),
+        start_time=start_time,
+        end_time=end_time,
+        price=price,
+        discount_percent=discount,
+        available=available,
+    )
+    schedules_changed()
+    invalidate_menu()
+    return created_response("Schedule added", id=str(rule.id))
+
+
+@require_auth
+@csrf_protect
+@require_http_methods(["DELETE"])
+def remove_schedule(request, schedule_id: str):
+    try:
+        schedule_id = ObjectId(schedule_id)
+    except InvalidId:
+        return bad_request("Invalid schedule_id")
+
+    deleted, _ = MenuSchedule.objects.filter(id=schedule_id).delete()
+    if not deleted:
+        return not_found("Schedule doesn't exist")
+
+    schedules_changed()
+    invalidate_menu()
+    return success(f"Schedule {schedule_id} deleted.")
+
 # delete category, delete item # Nemanja
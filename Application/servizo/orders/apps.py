@@ -6,4 +6,5 @@ class OrdersConfig(AppConfig):
     name = 'orders'
 
     def ready(self):
-        import orders.signals
\ No newline at end of file
+        import orders.signals
+        import helpers.querybudget
\ No newline at end of file
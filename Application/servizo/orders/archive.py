@@ -0,0 +1,87 @@
+import heapq
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from pymongo.errors import BulkWriteError
+from .models import Order, OrderStatus
+
+ARCHIVE_PREFIX = "orders_archive"
+CLOSED_STATUSES = [OrderStatus.PAID, OrderStatus.CANCELLED]
+DUPLICATE_KEY = 11000
+
+
+def archive_name(ordered_at):
+    # opcionalno jedna kolekcija po mesecu, npr. orders_archive_2026_10
+    if settings.ORDERS_ARCHIVE_MONTHLY and ordered_at is not None:
+        return f"{ARCHIVE_PREFIX}_{ordered_at:%Y_%m}"
+    return ARCHIVE_PREFIX
+
+
+def archive_collections():
+    names = connection.get_database().list_collection_names(filter={"name": {"$regex": f"^{ARCHIVE_PREFIX}"}})
+    # najnovije particije prve, nepodeljena arhiva na kraju
+    return sorted(names, reverse=True)
+
+
+def _insert(collection, docs):
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # ponovljen prenos posle prekida: dokument je vec u arhivi
+        if any(err["code"] != DUPLICATE_KEY for err in e.details.get("writeErrors", ())):
+            raise
+
+
+def archive_orders(older_than_days=None, batch_size=500):
+    days = settings.ORDERS_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    orders = connection.get_collection(Order._meta.db_table)
+    query = {"status": {"$in": CLOSED_STATUSES}, "ordered_at": {"$lt": cutoff}}
+
+    moved = 0
+    indexed = set()
+    while True:
+        batch = list(orders.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return moved
+
+        by_collection = {}
+        for doc in batch:
+            by_collection.setdefault(archive_name(doc.get("ordered_at")), []).append(doc)
+
+        # prvo upis u arhivu pa tek onda brisanje, da se nista ne izgubi ako proces padne
+        for name, docs in by_collection.items():
+            archive = connection.get_collection(name)
+            if name not in indexed:
+                archive.create_index([("table_num", 1), ("ordered_at", -1)])
+                archive.create_index([("ordered_at", -1)])
+                indexed.add(name)
+            _insert(archive, docs)
+
+        result = orders.delete_many({"_id": {"$in": [d["_id"] for d in batch]}, "status": {"$in": CLOSED_STATUSES}})
+        moved += result.deleted_count
+
+
+def order_history(table_num=None, before=None, limit=50):
+    # zatvorene porudzbine iz vruce kolekcije i arhive, od najnovije ka starijoj
+    query = {"status": {"$in": CLOSED_STATUSES}}
+    if table_num is not None:
+        query["table_num"] = table_num
+    if before is not None:
+        query["ordered_at"] = {"$lt": before}
+
+    def fetch(name):
+        return list(connection.get_collection(name).find(query).sort("ordered_at", -1).limit(limit))
+
+    docs = {d["_id"]: d for d in fetch(Order._meta.db_table)}
+    for name in archive_collections():
+        if len(docs) >= limit and settings.ORDERS_ARCHIVE_MONTHLY and name != ARCHIVE_PREFIX:
+            # particije su po mesecima, starije ne mogu imati novije porudzbine
+            oldest = heapq.nlargest(limit, docs.values(), key=lambda d: d["ordered_at"])[-1]["ordered_at"]
+            if name < archive_name(oldest):
+                continue
+        for doc in fetch(name):
+            docs.setdefault(doc["_id"], doc)
+
+    return heapq.nlargest(limit, docs.values(), key=lambda d: d["ordered_at"])
@@ -0,0 +1,27 @@
+import asyncio
+from django.conf import settings
+from events.hub import hub
+from tables.utils import abill_version
+
+
+async def wait_for_bill_change(table_num, known, timeout):
+    # dogadjaji iz ovog procesa bude cekanje odmah, a izmene iz drugih worker-a
+    # se hvataju proverom brojaca na svakih BILL_POLL_SECONDS
+    sub, _ = hub.subscribe(table_num)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return known
+            try:
+                await sub.get(min(remaining, settings.BILL_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+            version = await abill_version(table_num)
+            if version != known:
+                return version
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from helpers.idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_KEY_TTL
+from helpers.indexes import declare_index, declare_query
+from .archive import CLOSED_STATUSES
+from .kitchen import QUEUE_STATUSES
+from .models import Order, UNPAID_STATUSES
+
+ORDERS = Order._meta.db_table
+
+# sto, status pa vreme: nenaplacene porudzbine stola, dug stola i istorija sa sortiranjem
+declare_index(ORDERS, [("table_num", 1), ("status", 1), ("ordered_at", 1)])
+declare_index(ORDERS, [("status", 1), ("ordered_at", 1)])
+declare_index(IDEMPOTENCY_COLLECTION, [("created_at", 1)],
+              name="idempotency_keys_ttl", expireAfterSeconds=IDEMPOTENCY_KEY_TTL)
+
+declare_query("unpaid_orders", ORDERS, {"table_num": 1, "status": {"$in": UNPAID_STATUSES}}, [("ordered_at", 1)])
+declare_query("reconcile_table_due", ORDERS, {"status": {"$in": UNPAID_STATUSES}, "table_num": 1})
+declare_query("tables_overview", ORDERS, {"status": {"$in": UNPAID_STATUSES}})
+declare_query("kitchen_queue", ORDERS, {"status": {"$in": QUEUE_STATUSES}})
+declare_query("order_history", ORDERS, {"table_num": 1, "status": {"$in": CLOSED_STATUSES}}, [("ordered_at", -1)])
+declare_query("archive_candidates", ORDERS, {"status": {"$in": CLOSED_STATUSES}, "ordered_at": {"$lt": datetime(2000, 1, 1)}})
@@ -0,0 +1,239 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from pymongo import ReturnDocument
+from helpers.counters import bump_counter, get_counter
+from events.hub import publish, STAFF_ROLES
+from tables.utils import bill_changed
+from menu.models import Station
+from .models import Order, OrderStatus
+
+KITCHEN_VERSION_COUNTER = "kitchen"
+QUEUE_STATUSES = [OrderStatus.NEW, OrderStatus.PREPARING]
+QUEUE_PROJECTION = {"status": 1, "table_num": 1, "ordered_at": 1, "lines": 1, "stations": 1}
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+
+
+class KitchenError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _utc(value):
+    # dokumenti iz baze nose naivna UTC vremena, order_doc() svesna; u heap-u se porede pa ih svodimo na jedno
+    if value is None or timezone.is_aware(value):
+        return value
+    return value.replace(tzinfo=dt_timezone.utc)
+
+
+class Ticket:
+    # deo jedne porudzbine koji pripada jednoj stanici
+    __slots__ = ("order_id", "station", "table_num", "ordered_at", "lines", "state", "claimed_by", "claimed_at")
+
+    def __init__(self, doc, station, lines, state):
+        self.order_id = doc["_id"]
+        self.station = station
+        self.table_num = doc.get("table_num")
+        self.ordered_at = _utc(doc.get("ordered_at"))
+        self.lines = [{"id": str(l["item_id"]), "name": l["name"], "quantity": l["quantity"]} for l in lines]
+        self.state = state.get("status") or PENDING
+        self.claimed_by = state.get("by")
+        self.claimed_at = _utc(state.get("at"))
+
+    def to_dict(self):
+        return {
+            "order_id": str(self.order_id),
+            "station": self.station,
+            "table_num": self.table_num,
+            "ordered_at": self.ordered_at.isoformat() if self.ordered_at else None,
+            "state": self.state,
+            "claimed_by": self.claimed_by,
+            "claimed_at": self.claimed_at.isoformat() if self.claimed_at else None,
+            "items": self.lines,
+        }
+
+
+class KitchenQueue:
+    # po stanici: heap cekajucih tiketa po vremenu narucivanja i mapa preuzetih;
+    # stari ulazi u heap-u se preskacu pri citanju umesto da se brisu
+    def __init__(self, docs, version):
+        self.version = version
+        self.tickets = {}
+        self.by_order = defaultdict(set)
+        self.heaps = defaultdict(list)
+        self.claimed = defaultdict(dict)
+        self._seq = itertools.count()
+        for doc in docs:
+            self.put_order(doc)
+
+    def put_order(self, doc):
+        self.drop_order(doc["_id"])
+        if doc.get("status") not in QUEUE_STATUSES:
+            return
+
+        by_station = defaultdict(list)
+        for line in doc.get("lines") or []:
+            by_station[line.get("station") or Station.KITCHEN].append(line)
+
+        states = doc.get("stations") or {}
+        for station, lines in by_station.items():
+            state = states.get(station) or {}
+            if state.get("status") == DONE:
+                continue
+
+            ticket = Ticket(doc, station, lines, state)
+            self.tickets[(ticket.order_id, station)] = ticket
+            self.by_order[ticket.order_id].add(station)
+            if ticket.state == CLAIMED:
+                self.claimed[station][ticket.order_id] = ticket
+            else:
+                heapq.heappush(self.heaps[station], (ticket.ordered_at, next(self._seq), ticket))
+
+    def drop_order(self, order_id):
+        for station in self.by_order.pop(order_id, ()):
+            self.tickets.pop((order_id, station), None)
+            self.claimed[station].pop(order_id, None)
+
+    def _live(self, ticket):
+        return ticket.state == PENDING and self.tickets.get((ticket.order_id, ticket.station)) is ticket
+
+    def ticket(self, order_id, station):
+        return self.tickets.get((order_id, station))
+
+    def next_pending(self, station):
+        heap = self.heaps[station]
+        while heap and not self._live(heap[0][-1]):
+            heapq.heappop(heap)
+        return heap[0][-1] if heap else None
+
+    def pending(self, station, limit=None):
+        live = [entry for entry in self.heaps[station] if self._live(entry[-1])]
+        entries = heapq.nsmallest(limit, live) if limit else sorted(live)
+        return [entry[-1] for entry in entries]
+
+    def in_progress(self, station):
+        return sorted(self.claimed[station].values(), key=lambda t: (t.ordered_at, str(t.order_id)))
+
+
+_queue = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _load(version):
+    docs = connection.get_collection(Order._meta.db_table).find(
+        {"status": {"$in": QUEUE_STATUSES}}, QUEUE_PROJECTION)
+    return KitchenQueue(docs, version)
+
+
+def kitchen_queue() -> KitchenQueue:
+    global _queue, _checked_at
+
+    now = time.monotonic()
+    if _queue is not None and now - _checked_at < settings.KITCHEN_QUEUE_REFRESH_SECONDS:
+        return _queue
+
+    with _lock:
+        version = get_counter(KITCHEN_VERSION_COUNTER)
+        if _queue is None or _queue.version != version:
+            _queue = _load(version)
+        _checked_at = now
+        return _queue
+
+
+def kitchen_changed(orders=(), removed=()):
+    global _queue
+
+    version = bump_counter(KITCHEN_VERSION_COUNTER)
+    with _lock:
+        if _queue is not None and _queue.version == version - 1:
+            for order_id in removed:
+                _queue.drop_order(order_id)
+            for doc in orders:
+                _queue.put_order(doc)
+            _queue.version = version
+        else:
+            _queue = None
+
+
+def _drop_local():
+    global _queue
+
+    with _lock:
+        _queue = None
+
+
+def order_doc(order):
+    return {
+        "_id": order.id,
+        "status": order.status,
+        "table_num": order.table_num,
+        "ordered_at": order.ordered_at,
+        "lines": [{"item_id": l.item_id, "name": l.name, "quantity": l.quantity, "station": l.station}
+                  for l in order.lines],
+    }
+
+
+def claim_ticket(station, order_id=None, by=None):
+    orders = connection.get_collection(Order._meta.db_table)
+
+    for _ in range(settings.KITCHEN_CLAIM_RETRIES):
+        queue = kitchen_queue()
+        ticket = queue.ticket(order_id, station) if order_id else queue.next_pending(station)
+        if ticket is None:
+            if order_id:
+                raise KitchenError(f"Order {order_id} has nothing pending for {station}", status=404)
+            return None
+        if ticket.state != PENDING:
+            raise KitchenError(f"Order {ticket.order_id} is already claimed at {station}", status=409)
+
+        now = timezone.now()
+        doc = orders.find_one_and_update(
+            {"_id": ticket.order_id, "status": {"$in": QUEUE_STATUSES},
+             f"stations.{station}": {"$exists": False}},
+            {"$set": {f"stations.{station}": {"status": CLAIMED, "by": by, "at": now},
+                      "status": OrderStatus.PREPARING}},
+            projection=QUEUE_PROJECTION, return_document=ReturnDocument.AFTER)
+        if doc is not None:
+            kitchen_changed([doc])
+            bill_changed(doc["table_num"])
+            claimed = kitchen_queue().ticket(doc["_id"], station)
+            publish("kitchen.claimed", claimed.to_dict(), table_num=doc["table_num"], roles=STAFF_ROLES)
+            publish("order.status", {"id": str(doc["_id"]), "status": doc["status"], "table_num": doc["table_num"]},
+                    table_num=doc["table_num"])
+            return claimed
+
+        # drugi worker je bio brzi ili je porudzbina u medjuvremenu zatvorena,
+        # lokalni red je zastareo pa ga ucitavamo ponovo
+        _drop_local()
+
+    raise KitchenError("Queue is busy, try again", status=409)
+
+
+def complete_ticket(station, order_id):
+    doc = connection.get_collection(Order._meta.db_table).find_one_and_update(
+        {"_id": order_id, f"stations.{station}.status": CLAIMED},
+        {"$set": {f"stations.{station}.status": DONE, f"stations.{station}.done_at": timezone.now()}},
+        projection=QUEUE_PROJECTION, return_document=ReturnDocument.AFTER)
+    if doc is None:
+        raise KitchenError(f"Order {order_id} is not claimed at {station}", status=409)
+
+    kitchen_changed([doc])
+    # porudzbina je spremna kad su sve njene stanice zavrsile
+    stations = {line.get("station") or Station.KITCHEN for line in doc.get("lines") or []}
+    states = doc.get("stations") or {}
+    ready = all((states.get(s) or {}).get("status") == DONE for s in stations)
+    publish("kitchen.done", {"order_id": str(order_id), "station": station, "ready": ready},
+            table_num=doc["table_num"], roles=STAFF_ROLES)
+    return {"order_id": str(order_id), "station": station, "ready": ready}
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move closed (paid or cancelled) orders older than N days into the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ORDERS_ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        moved = archive_orders(options["days"], options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders"))
@@ -0,0 +1,161 @@
+import asyncio
+import statistics
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ["/api/menu/items/", "/api/tables/"]
+
+
+class _Connection:
+    # minimalan HTTP/1.1 klijent sa keep-alive, da merimo server a ne klijentsku biblioteku
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=(), body=b""):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+
+        response_headers = []
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers.append((name.strip().lower(), value.strip()))
+
+        lookup = dict(response_headers)
+        if lookup.get("transfer-encoding") == "chunked":
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self.reader.readexactly(int(lookup.get("content-length", 0)))
+
+        if lookup.get("connection") == "close":
+            await self.close()
+        return status, response_headers, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = "Load-test hot endpoints of a running server and report requests/second and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="GET path to hit, can be repeated (default: menu items and tables)")
+        parser.add_argument("--order-table", type=int,
+                            help="Also POST orders to /api/orders/create/<table>/")
+        parser.add_argument("--order-item", help="Menu item id used in benchmark orders")
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Number of server workers, used for the per-worker rate")
+        parser.add_argument("--compare-url",
+                            help="Run the same load against a second server (e.g. ASYNC_VIEWS=0) and compare")
+
+    def handle(self, *args, **options):
+        if options["order_table"] is not None and not options["order_item"]:
+            raise CommandError("--order-item is required with --order-table")
+
+        paths = options["paths"] or DEFAULT_PATHS
+        rates = self._bench(options["base_url"], paths, options)
+        if options["compare_url"]:
+            # drugi server tek posle prvog, da se ne takmice za isti CPU
+            other = self._bench(options["compare_url"], paths, options)
+            self.stdout.write("")
+            for target, rps in rates.items():
+                ratio = f"{rps / other[target]:.2f}x" if other.get(target) else "n/a"
+                self.stdout.write(f"{target:40} {options['base_url']} vs {options['compare_url']}: {ratio}")
+
+    def _bench(self, base_url, paths, options):
+        url = urlsplit(base_url)
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError(f"{base_url} must be an http:// URL")
+        self.host = url.hostname
+        self.port = url.port or 80
+
+        self.stdout.write(f"{base_url}  ({options['concurrency']} clients, {options['duration']:g}s)")
+        rates = {}
+        for target, latencies, errors in asyncio.run(self._run(paths, options)):
+            count = len(latencies)
+            rps = rates[target] = count / options["duration"]
+            line = f"{target:40} {count:8} req  {rps:9.1f} req/s  {rps / options['workers']:9.1f} req/s/worker"
+            if count:
+                ordered = sorted(latencies)
+                p99 = ordered[min(count - 1, int(count * 0.99))]
+                line += f"  p50 {statistics.median(ordered) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+            line += f"  errors {errors}"
+            self.stdout.write(line)
+        return rates
+
+    async def _csrf_headers(self):
+        conn = _Connection(self.host, self.port)
+        try:
+            _, headers, _ = await conn.request("GET", "/api/auth/csrf/")
+        finally:
+            await conn.close()
+
+        cookie = SimpleCookie()
+        for name, value in headers:
+            if name == "set-cookie":
+                cookie.load(value)
+        if "csrftoken" not in cookie:
+            raise CommandError("Server did not set a csrftoken cookie")
+        token = cookie["csrftoken"].value
+        return [("Cookie", f"csrftoken={token}"), ("X-CSRFToken", token), ("Content-Type", "application/json")]
+
+    async def _run(self, paths, options):
+        targets = [("GET", path, [], b"") for path in paths]
+        if options["order_table"] is not None:
+            body = ('{"items": [{"id": "%s", "quantity": 1}]}' % options["order_item"]).encode()
+            path = f"/api/orders/create/{options['order_table']}/"
+            targets.append(("POST", path, await self._csrf_headers(), body))
+
+        stats = {path: ([], [0]) for _, path, _, _ in targets}
+        deadline = time.monotonic() + options["duration"]
+
+        async def client(n):
+            conn = _Connection(self.host, self.port)
+            i = n
+            while time.monotonic() < deadline:
+                method, path, headers, body = targets[i % len(targets)]
+                i += 1
+                latencies, errors = stats[path]
+                started = time.monotonic()
+                try:
+                    status, _, _ = await conn.request(method, path, headers, body)
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    errors[0] += 1
+                    await conn.close()
+                    continue
+                if status >= 400:
+                    errors[0] += 1
+                else:
+                    latencies.append(time.monotonic() - started)
+            await conn.close()
+
+        await asyncio.gather(*(client(n) for n in range(options["concurrency"])))
+        return [(f"{method} {path}", stats[path][0], stats[path][1][0]) for method, path, _, _ in targets]
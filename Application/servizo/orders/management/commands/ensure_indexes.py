@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from helpers.indexes import load_declarations, ensure_indexes, explain_queries
+
+
+class Command(BaseCommand):
+    help = "Create declared indexes and check that every registered query shape uses one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only verify, do not create missing indexes")
+
+    def handle(self, *args, **options):
+        load_declarations()
+        created, problems = ensure_indexes(create=not options["check"])
+        for collection, keys in created:
+            self.stdout.write(f"created {collection} ({keys})")
+        for collection, keys, message in problems:
+            self.stderr.write(f"index {collection} ({keys}) {message}")
+
+        scans = []
+        for name, collection, stages in explain_queries():
+            self.stdout.write(f"{name:<24} {collection:<18} {' > '.join(stages) or '-'}")
+            if "COLLSCAN" in stages:
+                scans.append(name)
+
+        if problems or scans:
+            raise CommandError(f"{len(problems)} index problems, full collection scans in: {', '.join(scans) or 'none'}")
+        self.stdout.write(self.style.SUCCESS("All query shapes are covered by indexes"))
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:05
+
+from collections import Counter
+from decimal import Decimal
+import django_mongodb_backend.fields
+from bson import Decimal128
+from django.db import migrations, models
+from pymongo import UpdateOne
+import orders.models
+
+BATCH_SIZE = 500
+
+
+def items_to_lines(apps, schema_editor):
+    # stare porudzbine imaju po jedan ObjectId za svaki komad; cena u trenutku
+    # narucivanja nije sacuvana, pa uzimamo trenutnu cenu iz menija
+    connection = schema_editor.connection
+    orders = connection.get_collection("orders")
+    menu_items = connection.get_collection("menu_items")
+
+    cursor = orders.find({"items": {"$exists": True}}, {"items": 1}, batch_size=BATCH_SIZE)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            _convert_batch(orders, menu_items, batch)
+            batch = []
+    if batch:
+        _convert_batch(orders, menu_items, batch)
+
+
+def _convert_batch(orders, menu_items, batch):
+    ids = {oid for doc in batch for oid in doc.get("items") or []}
+    menu = {m["_id"]: m for m in menu_items.find({"_id": {"$in": list(ids)}}, {"name": 1, "price": 1})}
+
+    ops = []
+    for doc in batch:
+        lines = []
+        for item_id, quantity in Counter(doc.get("items") or []).items():
+            item = menu.get(item_id, {})
+            lines.append({
+                "item_id": item_id,
+                "name": item.get("name", "(deleted item)"),
+                "unit_price": item.get("price", Decimal128(Decimal("0.00"))),
+                "quantity": quantity,
+            })
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"lines": lines}, "$unset": {"items": ""}}))
+    orders.bulk_write(ops, ordered=False)
+
+
+def lines_to_items(apps, schema_editor):
+    orders = schema_editor.connection.get_collection("orders")
+    ops = []
+    for doc in orders.find({"lines": {"$exists": True}}, {"lines": 1}):
+        items = [line["item_id"] for line in doc["lines"] for _ in range(line["quantity"])]
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"items": items}, "$unset": {"lines": ""}}))
+        if len(ops) >= BATCH_SIZE:
+            orders.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        orders.bulk_write(ops, ordered=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', django_mongodb_backend.fields.ObjectIdField()),
+                ('name', models.CharField(max_length=50)),
+                ('unit_price', orders.models.EmbeddedDecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(items_to_lines, lines_to_items),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+def create_indexes(apps, schema_editor):
+    # red za kuhinju/sank ucitava otvorene porudzbine po vremenu narucivanja
+    connection = schema_editor.connection
+    connection.get_collection("orders").create_index([("status", 1), ("ordered_at", 1)])
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    connection.get_collection("orders").drop_index("status_1_ordered_at_1")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_lines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderline',
+            name='station',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
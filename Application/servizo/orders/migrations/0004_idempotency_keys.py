@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    # kljucevi idempotentnosti (helpers.idempotency) se brisu sami posle 24h
+    connection = schema_editor.connection
+    connection.get_collection("idempotency_keys").create_index(
+        "created_at", name="idempotency_keys_ttl", expireAfterSeconds=24 * 60 * 60)
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    connection.get_collection("idempotency_keys").drop_index("idempotency_keys_ttl")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderline_station'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
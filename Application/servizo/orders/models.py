@@ -1,11 +1,10 @@
 from django.db import models
 from decimal import Decimal
 from django_mongodb_backend.fields import ObjectIdField
-from django_mongodb_backend.fields import ArrayField
+from django_mongodb_backend.fields import EmbeddedModelArrayField
+from django_mongodb_backend.models import EmbeddedModel
 from django.utils import timezone
-from bson import ObjectId
-from collections import Counter
-from menu.models import MenuItem
+from bson import ObjectId, Decimal128
 
 
 class OrderStatus(models.TextChoices):
@@ -15,63 +14,103 @@ class OrderStatus(models.TextChoices):
     PAID = "paid", "Paid"
     CANCELLED = "cancelled", "Cancelled"
 
+
+UNPAID_STATUSES = [OrderStatus.NEW, OrderStatus.PREPARING, OrderStatus.SERVED]
+
+# dozvoljeni prelazi za masovnu promenu statusa (placanje ide kroz pay)
+ORDER_TRANSITIONS = {
+    OrderStatus.NEW: {OrderStatus.PREPARING, OrderStatus.SERVED, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.SERVED, OrderStatus.CANCELLED},
+    OrderStatus.SERVED: {OrderStatus.CANCELLED},
+}
+
+class EmbeddedDecimalField(models.DecimalField):
+    # ugnjezdeni modeli ne prolaze kroz konvertere backend-a, pa Decimal128 stize ovde
+    def to_python(self, value):
+        if isinstance(value, Decimal128):
+            value = value.to_decimal()
+        return super().to_python(value)
+
+
+# stavka porudzbine cuva naziv i cenu u trenutku narucivanja
+class OrderLine(EmbeddedModel):
+    item_id = ObjectIdField()
+    name = models.CharField(max_length=50)
+    unit_price = EmbeddedDecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+    # kuhinja ili sank, odredjuje se po kategoriji u trenutku narucivanja
+    station = models.CharField(max_length=20, null=True, blank=True)
+
+    @property
+    def subtotal(self):
+        return self.unit_price * self.quantity
+
+
 # Create your models here.
 class Order(models.Model):
     id = ObjectIdField(primary_key=True, default=ObjectId, db_column="_id")
-    items = ArrayField(ObjectIdField(), default=list, null=False)
+    lines = EmbeddedModelArrayField(OrderLine, default=list, null=False)
     table_num = models.IntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"), editable=False)
     ordered_at = models.DateTimeField(auto_now_add=True, editable=False)
     status = models.CharField(max_length=20, default=OrderStatus.NEW, choices=OrderStatus.choices)
     paid_at = models.DateTimeField(editable=False, null=True, blank=True)
+    # raste pri svakoj izmeni stavki, koristi se kao uslov za atomicne izmene
+    version = models.IntegerField(default=0, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_state()
+        return instance
+
+    @property
+    def due(self):
+        # iznos kojim porudzbina ulazi u dug stola
+        return self.total_price if self.status in UNPAID_STATUSES else Decimal("0.00")
+
+    def _remember_state(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_status = None if "status" in deferred else self.status
+        if {"table_num", "status", "total_price"} & deferred:
+            self._loaded_due = None
+        else:
+            self._loaded_due = (self.table_num, self.due)
+
+    def _set_status(self, status, **fields):
+        # uslovni upis mimo save(), pa signal ne okida; isti posao radi set_order_status
+        from .utils import set_order_status
+        return set_order_status(self, status, **fields)
 
     def pay(self, at=None):
         if self.status == OrderStatus.PAID:
             return False
-        
-        self.status = OrderStatus.PAID
-        self.paid_at = at or timezone.now()
-
-        self.save(update_fields=['status', 'paid_at'])
-        return True
+        return self._set_status(OrderStatus.PAID, paid_at=at or timezone.now())
 
     def prepare(self):
-        self.status = OrderStatus.PREPARING
+        return self._set_status(OrderStatus.PREPARING)
 
-        self.save(update_fields=['status'])
-    
     def served(self):
-        self.status = OrderStatus.SERVED
+        return self._set_status(OrderStatus.SERVED)
 
-        self.save(update_fields=['status'])
-    
     def cancel(self):
-        self.status = OrderStatus.CANCELLED
-
-        self.save(update_fields=['status'])
+        return self._set_status(OrderStatus.CANCELLED)
 
     @staticmethod
     def unpaid_for_table(table_num: int):
         return Order.objects.filter(
             table_num=table_num,
-            status__in=[OrderStatus.NEW, OrderStatus.PREPARING, OrderStatus.SERVED]
-        )
-    
-    def get_order_items(self):
-        return MenuItem.objects.filter(
-            id__in=self.items
+            status__in=UNPAID_STATUSES
         )
     
     def save(self, *args, **kwargs):
-        from menu.models import MenuItem
-
-        counts = Counter(self.items)
-
-        all_items = MenuItem.objects.filter(id__in=counts.keys())
-
-        total = sum((item.price*counts[item.id] for item in all_items), Decimal("0.00"))
-
-        self.total_price = total
+        # cene su u stavkama, pa ukupan iznos ne zavisi od kasnijih promena menija;
+        # kod delimicnog cuvanja bez stavki ostaje iznos iz baze (stare porudzbine mogu da odstupaju)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"lines", "total_price"} & set(update_fields):
+            self.total_price = sum((line.subtotal for line in self.lines), Decimal("0.00"))
+            if update_fields is not None and "total_price" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "total_price"]
 
         super().save(*args, **kwargs)
 
@@ -1,8 +1,46 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Order
-from tables.utils import calc_table_due
+from .utils import order_placed
+from tables.utils import reconcile_table_due, adjust_table_due, bill_changed
+from events.hub import publish
+from .kitchen import QUEUE_STATUSES, kitchen_changed
 
-@receiver([post_save, post_delete], sender=Order)
-def update_table_due(sender, instance, **kwargs):
-    calc_table_due(instance.table_num)
+@receiver(post_save, sender=Order)
+def update_table_due(sender, instance, created=False, **kwargs):
+    if created:
+        order_placed(instance)
+        return
+
+    loaded = getattr(instance, "_loaded_due", None)
+    if loaded is None:
+        # ne znamo prethodno stanje (npr. delimicno ucitan model), racunamo ponovo
+        reconcile_table_due(instance.table_num)
+        bill_changed(instance.table_num)
+    else:
+        # dug stola se menja samo za razliku izmedju starog i novog stanja porudzbine
+        old_table, old_due = loaded
+        if old_table != instance.table_num:
+            adjust_table_due(old_table, -old_due)
+            old_due = 0
+        adjust_table_due(instance.table_num, instance.due - old_due)
+    loaded_status = getattr(instance, "_loaded_status", None)
+    instance._remember_state()
+
+    if instance.status not in QUEUE_STATUSES and loaded_status != instance.status:
+        kitchen_changed(removed=[instance.id])
+    publish("order.status", {"id": str(instance.id), "status": instance.status,
+                             "table_num": instance.table_num}, table_num=instance.table_num)
+
+@receiver(post_delete, sender=Order)
+def update_table_due_on_delete(sender, instance, **kwargs):
+    loaded = getattr(instance, "_loaded_due", None)
+    if loaded is None:
+        reconcile_table_due(instance.table_num)
+        bill_changed(instance.table_num)
+    else:
+        adjust_table_due(loaded[0], -loaded[1])
+    kitchen_changed(removed=[instance.id])
+
+    publish("order.deleted", {"id": str(instance.id), "table_num": instance.table_num},
+            table_num=instance.table_num)
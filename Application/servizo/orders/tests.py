@@ -1,3 +1,134 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from bson import ObjectId
+from django.test import SimpleTestCase, override_settings
+from . import kitchen
+from .kitchen import KitchenQueue, KitchenError, CLAIMED, DONE, order_doc, claim_ticket, complete_ticket
+from .models import OrderStatus
 
-# Create your tests here.
+START = datetime(2026, 3, 1, 18, 0)
+
+
+def raw_doc(minutes, station="kitchen", status=OrderStatus.NEW, stations=None):
+    # kao dokument iz kolekcije: naivno UTC vreme
+    return {
+        "_id": ObjectId(), "status": status, "table_num": 1,
+        "ordered_at": START + timedelta(minutes=minutes),
+        "lines": [{"item_id": ObjectId(), "name": "Burger", "quantity": 1, "station": station}],
+        "stations": stations or {},
+    }
+
+
+def placed_doc(minutes, station="kitchen"):
+    # kao order_doc() posle upisa: svesno vreme
+    line = SimpleNamespace(item_id=ObjectId(), name="Pivo", quantity=2, station=station)
+    order = SimpleNamespace(id=ObjectId(), status=OrderStatus.NEW, table_num=2, lines=[line],
+                            ordered_at=(START + timedelta(minutes=minutes)).replace(tzinfo=dt_timezone.utc))
+    return order_doc(order)
+
+
+class KitchenQueueTests(SimpleTestCase):
+    def test_mixed_naive_and_aware_times_are_ordered(self):
+        first, third = raw_doc(0), raw_doc(10)
+        queue = KitchenQueue([third, first], 1)
+        second = placed_doc(5)
+        queue.put_order(second)
+
+        pending = queue.pending("kitchen")
+        self.assertEqual([t.order_id for t in pending], [first["_id"], second["_id"], third["_id"]])
+        self.assertEqual(queue.next_pending("kitchen").order_id, first["_id"])
+        self.assertEqual([t.order_id for t in queue.pending("kitchen", limit=2)], [first["_id"], second["_id"]])
+        self.assertTrue(all(t.ordered_at.tzinfo is not None for t in pending))
+
+    def test_to_dict_has_utc_offset(self):
+        queue = KitchenQueue([raw_doc(0, stations={"kitchen": {"status": CLAIMED, "by": "ana", "at": START}})], 1)
+        ticket = queue.in_progress("kitchen")[0].to_dict()
+        self.assertEqual(ticket["ordered_at"], "2026-03-01T18:00:00+00:00")
+        self.assertEqual(ticket["claimed_at"], "2026-03-01T18:00:00+00:00")
+
+    def test_in_progress_sorts_mixed_times(self):
+        queue = KitchenQueue([raw_doc(10, stations={"kitchen": {"status": CLAIMED, "at": START}})], 1)
+        doc = placed_doc(0)
+        doc["stations"] = {"kitchen": {"status": CLAIMED, "at": datetime.now(dt_timezone.utc)}}
+        queue.put_order(doc)
+        self.assertEqual(queue.in_progress("kitchen")[0].order_id, doc["_id"])
+
+    def test_tickets_split_by_station_and_skip_done(self):
+        doc = raw_doc(0)
+        doc["lines"].append({"item_id": ObjectId(), "name": "Pivo", "quantity": 1, "station": "bar"})
+        doc["stations"] = {"bar": {"status": DONE}}
+        queue = KitchenQueue([doc], 1)
+        self.assertIsNotNone(queue.ticket(doc["_id"], "kitchen"))
+        self.assertIsNone(queue.ticket(doc["_id"], "bar"))
+
+    def test_closed_order_leaves_queue(self):
+        doc = raw_doc(0)
+        queue = KitchenQueue([doc], 1)
+        queue.put_order(dict(doc, status=OrderStatus.SERVED))
+        self.assertIsNone(queue.next_pending("kitchen"))
+        self.assertEqual(queue.pending("kitchen"), [])
+
+
+@override_settings(KITCHEN_QUEUE_REFRESH_SECONDS=60, KITCHEN_CLAIM_RETRIES=2)
+class ClaimCompleteTests(SimpleTestCase):
+    def setUp(self):
+        self.version = 1
+        self.collection = mock.Mock()
+        self.first, self.second = raw_doc(0), placed_doc(5)
+
+        def bump(name):
+            self.version += 1
+            return self.version
+
+        for target, kwargs in [
+            ("orders.kitchen.get_counter", {"side_effect": lambda name: self.version}),
+            ("orders.kitchen.bump_counter", {"side_effect": bump}),
+            ("orders.kitchen.connection", {"get_collection": mock.Mock(return_value=self.collection)}),
+            ("orders.kitchen._load", {"side_effect": lambda version: KitchenQueue([self.first], version)}),
+            ("orders.kitchen.bill_changed", {}),
+            ("orders.kitchen.publish", {}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(kitchen._drop_local)
+
+        # red ucitan iz baze, pa nova porudzbina dodata iz order_placed
+        kitchen._drop_local()
+        kitchen.kitchen_queue()
+        kitchen.kitchen_changed([self.second])
+
+    def stored(self, doc, **station):
+        # find_one_and_update vraca naivna vremena, kao pymongo
+        return dict(doc, status=OrderStatus.PREPARING, ordered_at=doc["ordered_at"].replace(tzinfo=None),
+                    stations={"kitchen": station})
+
+    def test_claim_takes_oldest_and_complete_removes_it(self):
+        self.collection.find_one_and_update.return_value = self.stored(
+            self.first, status=CLAIMED, by="ana", at=START)
+        claimed = claim_ticket("kitchen", by="ana")
+
+        self.assertEqual(claimed.order_id, self.first["_id"])
+        self.assertEqual(claimed.state, CLAIMED)
+        queue = kitchen.kitchen_queue()
+        self.assertEqual(queue.next_pending("kitchen").order_id, self.second["_id"])
+        self.assertEqual([t.order_id for t in queue.in_progress("kitchen")], [self.first["_id"]])
+
+        self.collection.find_one_and_update.return_value = self.stored(self.first, status=DONE)
+        result = complete_ticket("kitchen", self.first["_id"])
+        self.assertEqual(result, {"order_id": str(self.first["_id"]), "station": "kitchen", "ready": True})
+        self.assertEqual(queue.in_progress("kitchen"), [])
+        self.assertIsNone(queue.ticket(self.first["_id"], "kitchen"))
+
+    def test_claim_lost_to_other_worker_reloads_and_gives_up(self):
+        self.collection.find_one_and_update.return_value = None
+        with self.assertRaises(KitchenError) as raised:
+            claim_ticket("kitchen", by="ana")
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_complete_unclaimed_is_conflict(self):
+        self.collection.find_one_and_update.return_value = None
+        with self.assertRaises(KitchenError) as raised:
+            complete_ticket("kitchen", self.first["_id"])
+        self.assertEqual(raised.exception.status, 409)
@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASYNC_VIEWS=0 vraca sinhrone view-ove (npr. za poredjenje sa benchmark_views)
+if settings.ASYNC_VIEWS:
+    make_order, unpaid_orders_view, table_bill = views.amake_order, views.aunpaid_orders_view, views.atable_bill
+else:
+    make_order, unpaid_orders_view, table_bill = views.make_order, views.unpaid_orders_view, views.table_bill
+
 urlpatterns = [
-    path('create/<int:table_num>/', views.make_order, name="make-order"),                
+    path('create/<int:table_num>/', make_order, name="make-order"),                
     path('cancel/<str:order_id>/', views.cancel_order, name="cancel-order"), 
-    path('unpaid/<int:table_num>/', views.unpaid_orders_view, name="unpaid-orders"),        
+    path('unpaid/<int:table_num>/', unpaid_orders_view, name="unpaid-orders"),
+    path('bill/<int:table_num>/', table_bill, name="table-bill"),        
     path('pay/<str:order_id>/', views.pay_order, name="pay-order"),                    
     path('pay-table/', views.pay_table, name="pay-table-orders"),   
+    path('history/', views.order_history_view, name="order-history"),
+    path('status/', views.transition_orders_view, name="transition-orders"),
+    path('kitchen/<str:station>/', views.kitchen_view, name="kitchen-queue"),
+    path('kitchen/<str:station>/claim/', views.claim_kitchen_order, name="kitchen-claim"),
+    path('kitchen/<str:station>/<str:order_id>/complete/', views.complete_kitchen_order, name="kitchen-complete"),
     path('<str:order_id>/', views.get_order, name="get-order"),  
     path('remove-item/<str:order_id>/', views.remove_item, name="remove-item-from-order"),         
     path('add-item/<str:order_id>/', views.add_item, name="add-item-to-order"),
@@ -1,25 +1,378 @@
-from collections import Counter
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils import timezone
+from pymongo import ReturnDocument
+from bson import ObjectId, Decimal128
+from bson.errors import InvalidId
 from menu.models import MenuItem
+from menu.schedules import effective_state
+from menu.tree import category_index
+from tables.utils import adjust_table_due, reconcile_table_due, bill_changed
+from events.hub import publish
+from helpers.asyncmongo import async_database
+from .models import Order, OrderLine, OrderStatus, UNPAID_STATUSES, ORDER_TRANSITIONS
+from .kitchen import QUEUE_STATUSES, DONE, kitchen_changed, order_doc
 
+EDIT_RETRIES = 3
 
-def serialize_order(order):
-    counts = Counter(order.items)
 
-    items = MenuItem.objects.filter(id__in=counts.keys())
+class OrderItemError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+PRICING_FIELDS = ("id", "name", "price", "available", "category_id")
+
+
+def parse_order_entries(entries):
+    if not isinstance(entries, list) or not entries:
+        raise OrderItemError("Field 'items' must be a non-empty list")
+
+    quantities = Counter()
+    for entry in entries:
+        try:
+            quantity = int(entry.get("quantity"))
+            item_id = ObjectId(entry.get("id"))
+        except (AttributeError, TypeError, ValueError, InvalidId):
+            raise OrderItemError(f"Invalid order line {entry}")
+        if quantity <= 0:
+            raise OrderItemError(f"Quantity for item {item_id} must be positive")
+        quantities[item_id] += quantity
+    return quantities
+
+
+def build_order_lines(quantities, items):
+    categories = category_index()
+    lines = []
+    total = Decimal("0.00")
+    for item_id, quantity in quantities.items():
+        item = items.get(item_id)
+        if item is None:
+            raise OrderItemError(f"Item {item_id} not found", status=404)
+
+        price, available = effective_state(item)
+        if not available:
+            raise OrderItemError(f"{item.name} is currently unavailable")
+
+        lines.append(OrderLine(item_id=item.id, name=item.name, unit_price=price, quantity=quantity,
+                               station=categories.station(item.category_id)))
+        total += price * quantity
 
-    item_details = []
-    for item in items:
-        item_details.append({
-            "id": str(item.id),
-            "name": item.name,
-            "price": str(item.price),
-            "quantity": counts[item.id],
-        })
+    return lines, total
 
+
+def price_order_items(entries):
+    quantities = parse_order_entries(entries)
+
+    # sve stavke korpe u jednom $in upitu
+    items = {i.id: i for i in MenuItem.objects.filter(id__in=list(quantities)).only(*PRICING_FIELDS)}
+    return build_order_lines(quantities, items)
+
+
+async def aprice_order_items(entries):
+    quantities = parse_order_entries(entries)
+
+    projection = {"name": 1, "price": 1, "available": 1, "category_id": 1}
+    cursor = async_database()[MenuItem._meta.db_table].find({"_id": {"$in": list(quantities)}}, projection)
+    items = {
+        d["_id"]: MenuItem(id=d["_id"], name=d["name"], price=d["price"].to_decimal(),
+                           available=d.get("available", True), category_id=d["category_id"])
+        async for d in cursor
+    }
+    # indeksi menija su u memoriji, ali osvezavanje ume da ode u bazu, pa ide van event loop-a
+    return await sync_to_async(build_order_lines, thread_sensitive=False)(quantities, items)
+
+
+def serialize_line(line):
+    return {
+        "id": str(line.item_id),
+        "name": line.name,
+        "price": str(line.unit_price),
+        "quantity": line.quantity,
+    }
+
+
+def serialize_order(order):
     return {
         "id": str(order.id),
         "status": order.status,
-        "ordered_at": order.ordered_at.isoformat(),
+        "table_num": order.table_num,
+        "ordered_at": _isoformat(order.ordered_at),
+        "paid_at": _isoformat(order.paid_at),
         "total_price": str(order.total_price),
-        "items": item_details,
+        "items": [serialize_line(line) for line in order.lines],
     }
+
+
+def order_placed(order):
+    # nova porudzbina samo dodaje svoj iznos, nema potrebe za ponovnim sabiranjem
+    # dug i verzija racuna jednim upisom
+    adjust_table_due(order.table_num, order.due)
+    order._remember_state()
+    kitchen_changed([order_doc(order)])
+    publish("order.created", serialize_order(order), table_num=order.table_num)
+
+
+def set_order_status(order, status, **fields):
+    # uslov je status koji instanca ima u memoriji: od dva paralelna prelaza (npr. pay_order i
+    # Stripe webhook) upis i promena duga prolaze samo za jedan
+    doc = connection.get_collection(Order._meta.db_table).find_one_and_update(
+        {"_id": order.id, "status": order.status}, {"$set": {"status": status, **fields}},
+        projection={"table_num": 1, "total_price": 1}, return_document=ReturnDocument.BEFORE)
+    if doc is None:
+        return False
+
+    was_due = order.status in UNPAID_STATUSES
+    # dug se menja za iznos iz baze, ne za ponovo sabrane stavke
+    order.table_num = doc["table_num"]
+    order.total_price = doc["total_price"].to_decimal()
+    order.status = status
+    for name, value in fields.items():
+        setattr(order, name, value)
+    order._remember_state()
+
+    delta = Decimal("0.00")
+    if was_due != (status in UNPAID_STATUSES):
+        delta = order.total_price if not was_due else -order.total_price
+    adjust_table_due(order.table_num, delta)
+    if status not in QUEUE_STATUSES:
+        kitchen_changed(removed=[order.id])
+    publish("order.status", {"id": str(order.id), "status": status, "table_num": order.table_num},
+            table_num=order.table_num)
+    return True
+
+
+def _isoformat(value):
+    if value is None:
+        return None
+    # pymongo vraca naivna UTC vremena
+    if timezone.is_naive(value):
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value.isoformat()
+
+
+def serialize_order_doc(doc):
+    # isto kao serialize_order, ali nad sirovim dokumentom iz kolekcije
+    return {
+        "id": str(doc["_id"]),
+        "status": doc.get("status"),
+        "table_num": doc.get("table_num"),
+        "ordered_at": _isoformat(doc.get("ordered_at")),
+        "paid_at": _isoformat(doc.get("paid_at")),
+        "total_price": str(doc["total_price"].to_decimal()),
+        "items": [{
+            "id": str(line["item_id"]),
+            "name": line["name"],
+            "price": str(line["unit_price"].to_decimal()),
+            "quantity": line["quantity"],
+        } for line in doc.get("lines") or []],
+    }
+
+
+def serialize_orders(docs):
+    return [serialize_order_doc(doc) for doc in docs]
+
+
+UNPAID_PROJECTION = {"status": 1, "table_num": 1, "ordered_at": 1, "paid_at": 1, "total_price": 1, "lines": 1}
+
+
+def unpaid_order_docs(table_num: int):
+    return connection.get_collection(Order._meta.db_table).find(
+        {"table_num": table_num, "status": {"$in": UNPAID_STATUSES}}, UNPAID_PROJECTION,
+    ).sort("ordered_at", 1)
+
+
+async def aunpaid_order_docs(table_num: int):
+    cursor = async_database()[Order._meta.db_table].find(
+        {"table_num": table_num, "status": {"$in": UNPAID_STATUSES}}, UNPAID_PROJECTION,
+    ).sort("ordered_at", 1)
+    return await cursor.to_list()
+
+
+def new_order_doc(table_num, lines, total):
+    # isti oblik dokumenta koji bi upisao Order.save(), za upis preko async drajvera
+    field = Order._meta.get_field("lines").base_field
+    return {
+        "_id": ObjectId(),
+        "lines": [field.get_db_prep_save(line, connection) for line in lines],
+        "table_num": table_num,
+        "total_price": Decimal128(total),
+        "ordered_at": timezone.now(),
+        "status": OrderStatus.NEW,
+        "paid_at": None,
+        "version": 0,
+    }
+
+
+def _edit_order(order_id, build_update):
+    orders = connection.get_collection(Order._meta.db_table)
+
+    for _ in range(EDIT_RETRIES):
+        doc = orders.find_one({"_id": order_id}, {"lines": 1, "status": 1, "table_num": 1, "version": 1, "stations": 1})
+        if doc is None:
+            raise OrderItemError(f"Order {order_id} not found", status=404)
+        if doc["status"] not in UNPAID_STATUSES:
+            raise OrderItemError(f"Order {order_id} can no longer be changed")
+
+        version = doc.get("version") or 0
+        update, delta = build_update(doc)
+        update.setdefault("$inc", {}).update({"total_price": Decimal128(delta), "version": 1})
+
+        # uslov na verziji: ako je neko drugi u medjuvremenu menjao stavke, pokusavamo ponovo
+        guard = {"_id": order_id, "status": {"$in": UNPAID_STATUSES},
+                 "version": version if version else {"$in": [0, None]}}
+        updated = orders.find_one_and_update(guard, update, return_document=ReturnDocument.AFTER)
+        if updated is not None:
+            adjust_table_due(updated["table_num"], delta)
+            if updated["status"] in QUEUE_STATUSES:
+                kitchen_changed([updated])
+            publish("order.updated", serialize_order_doc(updated), table_num=updated["table_num"])
+            return updated
+
+    raise OrderItemError(f"Order {order_id} was changed concurrently, try again", status=409)
+
+
+def add_order_item(order_id, item_id):
+    lines, price = price_order_items([{"id": item_id, "quantity": 1}])
+    new_line = lines[0]
+
+    def build_update(doc):
+        # ista stavka po istoj ceni se samo uvecava, inace ide nova stavka
+        for i, line in enumerate(doc.get("lines") or []):
+            if line["item_id"] == new_line.item_id and line["unit_price"].to_decimal() == new_line.unit_price:
+                update = {"$inc": {f"lines.{i}.quantity": 1}}
+                break
+        else:
+            field = Order._meta.get_field("lines").base_field
+            update = {"$push": {"lines": field.get_db_prep_save(new_line, connection)}}
+
+        # stanica koja je vec zavrsila dobija tiket ponovo
+        state = (doc.get("stations") or {}).get(new_line.station) or {}
+        if state.get("status") == DONE:
+            update["$unset"] = {f"stations.{new_line.station}": ""}
+        return update, price
+
+    return _edit_order(order_id, build_update)
+
+
+def remove_order_item(order_id, item_id):
+    def build_update(doc):
+        current = doc.get("lines") or []
+        # uklanja se jedan komad, stavka nestaje kad kolicina padne na nulu
+        for i in reversed(range(len(current))):
+            line = current[i]
+            if line["item_id"] != item_id:
+                continue
+            price = line["unit_price"].to_decimal()
+            if line["quantity"] > 1:
+                return {"$inc": {f"lines.{i}.quantity": -1}}, -price
+            return {"$pull": {"lines": {"item_id": item_id, "unit_price": line["unit_price"], "quantity": 1}}}, -price
+
+        raise OrderItemError(f"Item {item_id} not found in order {order_id}", status=404)
+
+    return _edit_order(order_id, build_update)
+
+
+def transition_orders(order_ids, target):
+    orders = connection.get_collection(Order._meta.db_table)
+    docs = {d["_id"]: d for d in orders.find({"_id": {"$in": order_ids}}, {"status": 1, "table_num": 1, "total_price": 1})}
+
+    rejected = []
+    by_source = defaultdict(list)
+    for order_id in order_ids:
+        doc = docs.get(order_id)
+        if doc is None:
+            rejected.append({"id": str(order_id), "error": "Order not found"})
+        elif doc["status"] == target:
+            rejected.append({"id": str(order_id), "error": f"Order is already {target}"})
+        elif target not in ORDER_TRANSITIONS.get(doc["status"], ()):
+            rejected.append({"id": str(order_id), "error": f"Cannot move order from {doc['status']} to {target}"})
+        else:
+            by_source[doc["status"]].append(order_id)
+
+    # jedan update_many po polaznom statusu; uslov na statusu stiti od paralelnih izmena
+    updated = []
+    raced_tables = set()
+    for source, ids in by_source.items():
+        result = orders.update_many({"_id": {"$in": ids}, "status": source}, {"$set": {"status": target}})
+        if result.modified_count != len(ids):
+            raced_tables.update(docs[i]["table_num"] for i in ids)
+            moved = {d["_id"] for d in orders.find({"_id": {"$in": ids}, "status": target}, {"_id": 1})}
+            rejected.extend({"id": str(i), "error": "Order was changed concurrently"} for i in ids if i not in moved)
+            ids = [i for i in ids if i in moved]
+        updated.extend(ids)
+
+    deltas = defaultdict(Decimal)
+    changed = defaultdict(list)
+    for order_id in updated:
+        doc = docs[order_id]
+        changed[doc["table_num"]].append(order_id)
+        was_due = doc["status"] in UNPAID_STATUSES
+        if was_due != (target in UNPAID_STATUSES):
+            amount = doc["total_price"].to_decimal()
+            deltas[doc["table_num"]] += amount if target in UNPAID_STATUSES else -amount
+
+    for table_num, ids in changed.items():
+        if table_num in raced_tables:
+            # neka porudzbina je u medjuvremenu promenjena, dug racunamo ponovo
+            reconcile_table_due(table_num)
+            bill_changed(table_num)
+        else:
+            adjust_table_due(table_num, deltas[table_num])
+        publish("orders.status", {"ids": [str(i) for i in ids], "status": target, "table_num": table_num},
+                table_num=table_num)
+
+    if updated and target not in QUEUE_STATUSES:
+        kitchen_changed(removed=updated)
+
+    return updated, rejected
+
+
+def pay_orders(order_ids=None, table_num=None, statuses=UNPAID_STATUSES, at=None):
+    # placanje vise porudzbina odjednom: jedno citanje, jedan update_many i jedan $inc po stolu
+    orders = connection.get_collection(Order._meta.db_table)
+    query = {"status": {"$in": list(statuses)}}
+    if order_ids is not None:
+        query["_id"] = {"$in": list(order_ids)}
+    if table_num is not None:
+        query["table_num"] = table_num
+
+    docs = list(orders.find(query, {"status": 1, "table_num": 1, "total_price": 1}))
+    if not docs:
+        return []
+
+    at = at or timezone.now()
+    ids = [d["_id"] for d in docs]
+    result = orders.update_many({"_id": {"$in": ids}, "status": query["status"]},
+                                {"$set": {"status": OrderStatus.PAID, "paid_at": at}})
+    raced = result.modified_count != len(ids)
+    if raced:
+        # neka porudzbina je u medjuvremenu placena ili promenjena, zadrzavamo samo nase
+        paid = {d["_id"] for d in orders.find({"_id": {"$in": ids}, "status": OrderStatus.PAID}, {"_id": 1})}
+        docs = [d for d in docs if d["_id"] in paid]
+
+    deltas = defaultdict(Decimal)
+    changed = defaultdict(list)
+    for doc in docs:
+        changed[doc["table_num"]].append(doc["_id"])
+        if doc["status"] in UNPAID_STATUSES:
+            deltas[doc["table_num"]] -= doc["total_price"].to_decimal()
+
+    for table, paid_ids in changed.items():
+        if raced:
+            reconcile_table_due(table)
+            bill_changed(table)
+        else:
+            adjust_table_due(table, deltas[table])
+        publish("orders.status", {"ids": [str(i) for i in paid_ids], "status": OrderStatus.PAID,
+                                  "table_num": table}, table_num=table)
+
+    paid_ids = [d["_id"] for d in docs]
+    if paid_ids:
+        kitchen_changed(removed=paid_ids)
+    return paid_ids
@@ -1,24 +1,103 @@
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST, require_GET
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from helpers.utils import parse_json
 from helpers.responses import bad_request, success, not_found, created_response
-from .models import Order, OrderStatus
-from .utils import serialize_order
+from .models import Order, OrderStatus, ORDER_TRANSITIONS
+from .utils import (serialize_line, serialize_order_doc, serialize_orders, unpaid_order_docs, aunpaid_order_docs,
+                    price_order_items, aprice_order_items, new_order_doc, order_placed,
+                    add_order_item, remove_order_item, transition_orders, OrderItemError)
+from .archive import order_history
+from .bills import wait_for_bill_change
+from tables.utils import bill_version, abill_version
+from .kitchen import kitchen_queue, claim_ticket, complete_ticket, KitchenError
+from helpers.querybudget import query_budget
+from helpers.idempotency import idempotent
+from helpers.asyncmongo import async_database
+from accounts.views import require_auth
+from menu.models import Station
 from bson import ObjectId
-from menu.models import MenuItem
+from bson.errors import InvalidId
+from django.utils.dateparse import parse_datetime
+
+MAX_BULK_ORDERS = 200
+MAX_HISTORY_ORDERS = 200
+
 
 
 @csrf_exempt
 @require_GET
 def unpaid_orders_view(request, table_num: int):
-    from tables.models import Table
-    table = Table.objects.get(table_number=table_num)
-    unpaid_orders = table.unpaid_orders
+    # stavke nose naziv i cenu, pa je ceo odgovor jedan upit bez ucitavanja modela
+    return JsonResponse({"orders": serialize_orders(unpaid_order_docs(table_num))})
+
+
+def _bill_params(request):
+    known = int(request.GET["version"]) if request.GET.get("version") else None
+    wait = min(float(request.GET.get("wait", 0)), settings.BILL_MAX_WAIT_SECONDS)
+    return known, wait
+
+
+@require_GET
+def table_bill(request, table_num: int):
+    try:
+        known, _ = _bill_params(request)
+    except ValueError:
+        return bad_request("Parameters 'version' and 'wait' must be numbers")
+
+    # bez long-poll-a: pod WSGI-jem bi cekanje drzalo ceo thread, 'wait' se samo ignorise
+    version = bill_version(table_num)
+    if known == version:
+        return HttpResponseNotModified()
+
+    orders = serialize_orders(unpaid_order_docs(table_num))
+    return JsonResponse({"table_num": table_num, "version": version, "orders": orders})
+
+
+@require_GET
+async def atable_bill(request, table_num: int):
+    try:
+        known, wait = _bill_params(request)
+    except ValueError:
+        return bad_request("Parameters 'version' and 'wait' must be numbers")
+
+    # verzija se cita pre porudzbina, pa odgovor nikad nije stariji od verzije koju nosi
+    version = await abill_version(table_num)
+    if known == version and wait > 0:
+        version = await wait_for_bill_change(table_num, known, wait)
+    if known == version:
+        return HttpResponseNotModified()
+
+    orders = serialize_orders(await aunpaid_order_docs(table_num))
+    return JsonResponse({"table_num": table_num, "version": version, "orders": orders})
+
+
+@require_auth
+@require_GET
+def order_history_view(request):
+    try:
+        table_num = int(request.GET["table"]) if request.GET.get("table") else None
+        limit = min(int(request.GET.get("limit", 50)), MAX_HISTORY_ORDERS)
+    except ValueError:
+        return bad_request("Parameters 'table' and 'limit' must be integers")
+
+    before = None
+    if request.GET.get("before"):
+        before = parse_datetime(request.GET["before"])
+        if before is None:
+            return bad_request("Invalid 'before' datetime")
+
+    data = serialize_orders(order_history(table_num, before, max(limit, 1)))
+    # sledeca strana pocinje pre najstarije vracene porudzbine
+    return JsonResponse({"orders": data, "next_before": data[-1]["ordered_at"] if data else None})
 
-    data = [serialize_order(order) for order in unpaid_orders]
 
-    return JsonResponse({"orders": data})
+@csrf_exempt
+@require_GET
+async def aunpaid_orders_view(request, table_num: int):
+    return JsonResponse({"orders": serialize_orders(await aunpaid_order_docs(table_num))})
 
 
 @csrf_protect
@@ -61,30 +140,76 @@ def pay_order(request, order_id: str):
 
 @csrf_protect
 @require_POST
+# stavke + insert + $inc stola (dug i verzija racuna) + verzija reda za kuhinju + kljuc
+# idempotentnosti (rezervacija i odgovor) = 6, i povremene provere verzije menija (raspored)
+# i kategorija = 8; ponovno ucitavanje rasporeda/kategorija posle izmene menija moze da predje
+@query_budget(8)
+@idempotent
 def make_order(request, table_num: int):
     body = parse_json(request)
     if body is None:
         return bad_request("Invalid JSON")
 
-    items = body.get("items")
+    try:
+        lines, _ = price_order_items(body.get("items"))
+    except OrderItemError as e:
+        return bad_request(e.detail, status=e.status)
 
-    item_ids = []
+    # cene su vec u stavkama; signal samo uvecava dug stola
+    order = Order(table_num=table_num, lines=lines)
+    order.save()
 
-    for item_entry in items:
-        try:
-            quantity = item_entry.get("quantity")
-            item_id = item_entry.get("id")
+    return created_response("Order placed", str(order.id))
 
-            itemObj = MenuItem.objects.get(id=ObjectId(item_id))
-            if not itemObj.available:
-                return bad_request(f"{itemObj.name} is currently unavailable")
 
-            item_ids.extend([itemObj.id]*quantity)
-        except MenuItem.DoesNotExist:
-            return not_found(f"Item {item_entry.get('id')} not found")
+@require_auth
+@csrf_protect
+@require_POST
+def transition_orders_view(request):
+    body = parse_json(request)
+    if body is None:
+        return bad_request("Invalid JSON")
 
-    order = Order(table_num=table_num, items=item_ids)
-    order.save()
+    targets = set().union(*ORDER_TRANSITIONS.values())
+    status = body.get("status")
+    if status not in targets:
+        return bad_request(f"Field 'status' must be one of {', '.join(sorted(targets))}")
+
+    order_ids = body.get("order_ids")
+    if not isinstance(order_ids, list) or not order_ids:
+        return bad_request("Field 'order_ids' must be a non-empty list")
+    if len(order_ids) > MAX_BULK_ORDERS:
+        return bad_request(f"At most {MAX_BULK_ORDERS} orders per request")
+
+    try:
+        order_ids = list(dict.fromkeys(ObjectId(i) for i in order_ids))
+    except (InvalidId, TypeError):
+        return bad_request("Invalid order id in 'order_ids'")
+
+    updated, rejected = transition_orders(order_ids, status)
+    return JsonResponse({"status": status, "updated": [str(i) for i in updated], "rejected": rejected})
+
+
+@csrf_protect
+@require_POST
+@idempotent
+async def amake_order(request, table_num: int):
+    body = parse_json(request)
+    if body is None:
+        return bad_request("Invalid JSON")
+
+    try:
+        lines, total = await aprice_order_items(body.get("items"))
+    except OrderItemError as e:
+        return bad_request(e.detail, status=e.status)
+
+    # upis ide preko async drajvera, pa signal ne okida; isti posao radi order_placed
+    doc = new_order_doc(table_num, lines, total)
+    await async_database()[Order._meta.db_table].insert_one(doc)
+
+    order = Order(id=doc["_id"], table_num=table_num, lines=lines, total_price=total,
+                  ordered_at=doc["ordered_at"], status=doc["status"])
+    await sync_to_async(order_placed, thread_sensitive=False)(order)
 
     return created_response("Order placed", str(order.id))
 
@@ -99,7 +224,8 @@ def cancel_order(request, order_id):
     if order.status == OrderStatus.PAID:
         return bad_request("Cannot cancel a paid order")
 
-    order.cancel()
+    if not order.cancel():
+        return bad_request("Order was changed concurrently, try again", status=409)
     return success("Order cancelled")
 
 
@@ -110,11 +236,9 @@ def get_order(request, order_id: str):
     except Order.DoesNotExist:
         return not_found(f"Order {order_id} not found")
 
-    items = order.get_order_items()
-
     data = {
         "id": str(order.id),
-        "items": [{"name": item.name, "price": item.price} for item in items],
+        "items": [serialize_line(line) for line in order.lines],
         "table_num": order.table_num,
         "total_price": str(order.total_price),
         "ordered_at": order.ordered_at,
@@ -127,59 +251,96 @@ def get_order(request, order_id: str):
 @csrf_protect
 @require_POST
 def remove_item(request, order_id: str):
-    try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
-        return not_found(f"Order {order_id} not found")
-
     body = parse_json(request)
+    if body is None:
+        return bad_request("Invalid JSON")
+
     item_id = body.get("item_id")
     if not item_id:
         return bad_request("Missing item_id")
 
     try:
-        order.items.remove(item_id)  # ovo ce da ukloni jedno povaljivanje
-    except ValueError:
-        return not_found(f"Item {item_id} not found in order {order_id}")
+        doc = remove_order_item(ObjectId(order_id), ObjectId(item_id))
+    except InvalidId:
+        return bad_request("Invalid id")
+    except OrderItemError as e:
+        return bad_request(e.detail, status=e.status)
 
-    order.save()
-    return success({
-        "id": str(order.id),
-        "items": [str(i) for i in order.items],
-        "table_num": order.table_num,
-        "total_price": str(order.total_price),
-        "ordered_at": order.ordered_at,
-        "paid_at": order.paid_at,
-    })
+    return success(serialize_order_doc(doc))
 
 
 @csrf_protect
 @require_POST
 def add_item(request, order_id: str):
-    try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
-        return not_found(f"Order {order_id} not found")
-
     body = parse_json(request)
+    if body is None:
+        return bad_request("Invalid JSON")
+
     item_id = body.get("item_id")
     if not item_id:
         return bad_request("Missing item_id")
 
     try:
-        oid = ObjectId(item_id)
-    except Exception:
-        return bad_request("Invalid item_id")
+        doc = add_order_item(ObjectId(order_id), item_id)
+    except InvalidId:
+        return bad_request("Invalid id")
+    except OrderItemError as e:
+        return bad_request(e.detail, status=e.status)
 
-    order.items.append(oid)
-    order.save()
+    return success(serialize_order_doc(doc))
 
-    data = {
-        "id": str(order.id),
-        "items": [{"$oid": str(i)} for i in order.items],
-        "table_num": order.table_num,
-        "total_price": str(order.total_price),
-        "ordered_at": order.ordered_at.isoformat() if order.ordered_at else None,
-        "paid_at": order.paid_at.isoformat() if order.paid_at else None,
-    }
-    return success(data)
+
+@require_auth
+@require_GET
+def kitchen_view(request, station: str):
+    if station not in Station.values:
+        return not_found(f"Unknown station {station}")
+
+    queue = kitchen_queue()
+    return JsonResponse({
+        "station": station,
+        "version": queue.version,
+        "pending": [t.to_dict() for t in queue.pending(station)],
+        "claimed": [t.to_dict() for t in queue.in_progress(station)],
+    })
+
+
+@require_auth
+@csrf_protect
+@require_POST
+def claim_kitchen_order(request, station: str):
+    if station not in Station.values:
+        return not_found(f"Unknown station {station}")
+
+    body = parse_json(request) if request.body else {}
+    if body is None:
+        return bad_request("Invalid JSON")
+
+    try:
+        order_id = ObjectId(body["order_id"]) if body.get("order_id") else None
+        ticket = claim_ticket(station, order_id, by=request.user.username)
+    except InvalidId:
+        return bad_request("Invalid order_id")
+    except KitchenError as e:
+        return bad_request(e.detail, status=e.status)
+
+    if ticket is None:
+        return success(f"Nothing pending for {station}")
+    return success(ticket.to_dict())
+
+
+@require_auth
+@csrf_protect
+@require_POST
+def complete_kitchen_order(request, station: str, order_id: str):
+    if station not in Station.values:
+        return not_found(f"Unknown station {station}")
+
+    try:
+        result = complete_ticket(station, ObjectId(order_id))
+    except InvalidId:
+        return bad_request("Invalid order_id")
+    except KitchenError as e:
+        return bad_request(e.detail, status=e.status)
+
+    return success(result)
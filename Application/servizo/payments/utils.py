@@ -1,6 +1,7 @@
 from .models import Payment
 from django.utils import timezone
-from orders.models import Order
+from orders.models import OrderStatus, UNPAID_STATUSES
+from orders.utils import pay_orders
 from .models import PaymentStatus
 
 def handle_succeed_payment(pi_id, receipt_url):
@@ -20,6 +21,5 @@ def handle_succeed_payment(pi_id, receipt_url):
 
     payment.save(update_fields=fields)
 
-    orders = Order.objects.filter(id__in=payment.order_ids)
-    for order in orders:
-        order.pay(at=at)
\ No newline at end of file
+    # kao ranije order.pay(): placa se sve sto jos nije placeno, ukljucujuci otkazane
+    pay_orders(order_ids=payment.order_ids, statuses=[*UNPAID_STATUSES, OrderStatus.CANCELLED], at=at)
\ No newline at end of file
@@ -5,6 +5,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import django_mongodb_backend # pyright: ignore[reportMissingImports]
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv()
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
     "accounts",
     "payments",
     "waiters",
+    "events",
 ]
 
 AUTH_USER_MODEL = "accounts.User"
@@ -91,6 +93,48 @@ DATABASES = {
 }
 DATABASE_ROUTERS = ["django_mongodb_backend.routers.MongoRouter"]
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "servizo",
+    }
+}
+
+# najtrazeniji view-ovi (porudzbine, stolovi, meni) imaju async verziju preko AsyncMongoClient-a;
+# ukljucene su samo pod ASGI serverom (servizo/asgi.py postavlja podrazumevanu vrednost),
+# pod WSGI-jem (runserver) svaki async view bi dobio svoj event loop i svoj pool konekcija
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+
+# === Menu ===
+MENU_SNAPSHOT_TIMEOUT = 60 * 60  # verzija je u kljucu, pa je ovo samo gornja granica
+CATEGORY_INDEX_REFRESH_SECONDS = 1.0
+SEARCH_INDEX_REFRESH_SECONDS = 1.0
+MENU_SCHEDULE_REFRESH_SECONDS = 1.0
+MENU_CHANGES_OVERLAP_SECONDS = 2
+# vremena u rasporedima (happy hour) su lokalna vremena lokala, TIME_ZONE ostaje UTC
+VENUE_TIME_ZONE = os.getenv("VENUE_TIME_ZONE", "Europe/Belgrade")
+
+# === Orders ===
+IDEMPOTENCY_CACHE_SIZE = 1024
+IDEMPOTENCY_PENDING_TIMEOUT = 30  # posle ovoliko sekundi nezavrsen kljuc moze da se preuzme
+ORDERS_ARCHIVE_AFTER_DAYS = 30
+ORDERS_ARCHIVE_MONTHLY = False
+BILL_MAX_WAIT_SECONDS = 30
+BILL_POLL_SECONDS = 1.0
+
+# === Tables ===
+TABLES_OVERVIEW_TTL_SECONDS = 0.5  # pregled sale se deli izmedju svih konobara koji ga prate
+
+# === Kitchen ===
+KITCHEN_QUEUE_REFRESH_SECONDS = 1.0
+KITCHEN_CLAIM_RETRIES = 3
+
+# === Events ===
+EVENTS_BUFFER_SIZE = 500
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -118,6 +162,7 @@ MIGRATION_MODULES = {
 
 # === Sessions / CSRF / CORS ===
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
     "http://localhost:5173",
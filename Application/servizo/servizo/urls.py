@@ -22,6 +22,7 @@ urlpatterns = [
     path('api/menu/', include('menu.urls')),
     path('api/tables/', include('tables.urls')),
     path('api/payments/', include('payments.urls')),
+    path('api/events/', include('events.urls')),
 
     
     # ⬇️ Mount-ujemo accounts.urls na root,
@@ -0,0 +1,8 @@
+from helpers.indexes import declare_index, declare_query
+from .models import Table
+
+TABLES = Table._meta.db_table
+
+declare_index(TABLES, [("table_number", 1)], unique=True)
+
+declare_query("table_by_number", TABLES, {"table_number": 1})
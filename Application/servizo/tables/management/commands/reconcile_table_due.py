@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from tables.utils import reconcile_table_due
+
+
+class Command(BaseCommand):
+    help = "Recompute Table.amount_due from unpaid orders and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--table", type=int, help="Reconcile a single table")
+
+    def handle(self, *args, **options):
+        fixes = reconcile_table_due(options["table"])
+        for table_num, old, new in fixes:
+            self.stdout.write(f"table {table_num}: {old} -> {new}")
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(fixes)} tables"))
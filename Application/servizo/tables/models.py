@@ -3,7 +3,7 @@ from django_mongodb_backend.fields import ObjectIdField
 from bson import ObjectId
 from decimal import Decimal
 from orders.models import Order
-from orders.models import OrderStatus
+from orders.models import OrderStatus, UNPAID_STATUSES
 
 # Create your models here.
 
@@ -24,22 +24,15 @@ class Table(models.Model):
 
     @property
     def unpaid_orders(self):
-        return Order.objects.filter(table_num=self.table_number, status__in=[OrderStatus.NEW, OrderStatus.PREPARING, OrderStatus.SERVED])
+        return Order.objects.filter(table_num=self.table_number, status__in=UNPAID_STATUSES)
 
     @property
     def paid_orders(self):
         return Order.objects.filter(table_num=self.table_number, status=OrderStatus.PAID)
 
     def pay_all_orders(self):
-        unpaid = self.unpaid_orders
-        count = unpaid.count()
-        if count == 0:
-            return 0
-
-        for order in unpaid:
-            order.pay()
-
-        return count
+        from orders.utils import pay_orders
+        return len(pay_orders(table_num=self.table_number))
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+get_tables = views.aget_tables if settings.ASYNC_VIEWS else views.get_tables
+
 urlpatterns = [
     path('add/<int:table_number>/', views.add_table, name="add-table"),
     path('add_next_table/', views.add_next_table, name="add-next-table"),
-    path('', views.get_tables, name="get-tables"),
+    path('', get_tables, name="get-tables"),
+    path('overview/', views.tables_overview_view, name="tables-overview"),
     path('delete/<int:table_number>/', views.remove_table, name="remove-table"),
     path('<int:table_number>/', views.get_table, name="get-table"),
 ]
@@ -1,12 +1,155 @@
+import threading
+import time
+from datetime import timezone as dt_timezone
 from decimal import Decimal
+from bson import Decimal128
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from pymongo import ReturnDocument, UpdateOne
+from events.hub import publish
 
-def calc_table_due(table_num: int):
-    from orders.models import Order, OrderStatus
+
+# verzija racuna je u dokumentu stola, pa je promena duga i verzije jedan upis (adjust_table_due)
+BILL_VERSION_FIELD = "bill_version"
+
+
+def _tables():
+    from tables.models import Table
+    return connection.get_collection(Table._meta.db_table)
+
+
+def bill_version(table_num: int) -> int:
+    doc = _tables().find_one({"table_number": table_num}, {BILL_VERSION_FIELD: 1})
+    return (doc or {}).get(BILL_VERSION_FIELD) or 0
+
+
+async def abill_version(table_num: int) -> int:
+    from helpers.asyncmongo import async_database
+    from tables.models import Table
+    doc = await async_database()[Table._meta.db_table].find_one({"table_number": table_num}, {BILL_VERSION_FIELD: 1})
+    return (doc or {}).get(BILL_VERSION_FIELD) or 0
+
+
+def bill_changed(table_num: int):
+    # svaka promena porudzbina stola (nova, status, stavke, placanje) menja verziju racuna;
+    # kada se menja i dug, dovoljno je adjust_table_due
+    _tables().update_one({"table_number": table_num}, {"$inc": {BILL_VERSION_FIELD: 1}})
+
+
+def reconcile_table_due(table_num: int = None):
+    # dug se racuna na serveru ($sum po stolu), u Python stizu samo zbirovi
+    from orders.models import Order, UNPAID_STATUSES
+    from tables.models import Table
+
+    match = {"status": {"$in": UNPAID_STATUSES}}
+    tables_filter = {}
+    if table_num is not None:
+        match["table_num"] = table_num
+        tables_filter["table_number"] = table_num
+
+    totals = {
+        row["_id"]: row["due"].to_decimal()
+        for row in connection.get_collection(Order._meta.db_table).aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$table_num", "due": {"$sum": "$total_price"}}},
+        ])
+    }
+
+    tables = connection.get_collection(Table._meta.db_table)
+    fixes = []
+    for doc in tables.find(tables_filter, {"table_number": 1, "amount_due": 1}):
+        current = doc["amount_due"].to_decimal() if doc.get("amount_due") is not None else None
+        expected = totals.get(doc["table_number"], Decimal("0.00"))
+        if current != expected:
+            fixes.append((doc["table_number"], current, expected))
+
+    if fixes:
+        tables.bulk_write([
+            UpdateOne({"table_number": num}, {"$set": {"amount_due": Decimal128(expected)}})
+            for num, _, expected in fixes
+        ], ordered=False)
+        for num, _, expected in fixes:
+            publish_table_due(num, expected)
+    return fixes
+
+def adjust_table_due(table_num: int, delta: Decimal):
+    # dug stola i verzija racuna jednim upisom, i kada je razlika nula
+    update = {"$inc": {BILL_VERSION_FIELD: 1}}
+    if delta:
+        update["$inc"]["amount_due"] = Decimal128(delta)
+    doc = _tables().find_one_and_update(
+        {"table_number": table_num}, update,
+        projection={"amount_due": 1}, return_document=ReturnDocument.AFTER)
+    if doc is not None and delta:
+        publish_table_due(table_num, doc["amount_due"].to_decimal())
+
+
+def publish_table_due(table_num: int, amount_due: Decimal):
+    publish("table.balance", {"table_num": table_num, "amount_due": str(amount_due)}, table_num=table_num)
+
+
+def _overview_pipeline():
+    from orders.models import UNPAID_STATUSES
     from tables.models import Table
-    
-    prices = (Order.objects.filter(table_num = table_num)
-                .exclude(status__in=[OrderStatus.PAID])
-                .values_list("total_price", flat=True))
-    total = sum(prices, Decimal("0.00"))
 
-    Table.objects.filter(table_number=table_num).update(amount_due=total)
\ No newline at end of file
+    return [
+        {"$match": {"status": {"$in": UNPAID_STATUSES}}},
+        {"$group": {"_id": {"table": "$table_num", "status": "$status"}, "count": {"$sum": 1},
+                    "oldest": {"$min": "$ordered_at"}, "due": {"$sum": "$total_price"}}},
+        {"$group": {"_id": "$_id.table", "open": {"$sum": "$count"}, "oldest": {"$min": "$oldest"},
+                    "due": {"$sum": "$due"}, "statuses": {"$push": {"status": "$_id.status", "count": "$count"}}}},
+        # stolovi bez otvorenih porudzbina dolaze iz kolekcije stolova, u istom upitu
+        {"$unionWith": {"coll": Table._meta.db_table, "pipeline": [{"$project": {"_id": "$table_number"}}]}},
+        {"$group": {"_id": "$_id", "open": {"$sum": "$open"}, "oldest": {"$min": "$oldest"},
+                    "due": {"$sum": "$due"}, "statuses": {"$max": "$statuses"}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def build_tables_overview():
+    from orders.models import Order, UNPAID_STATUSES
+
+    now = timezone.now()
+    tables = []
+    for row in connection.get_collection(Order._meta.db_table).aggregate(_overview_pipeline()):
+        by_status = dict.fromkeys(UNPAID_STATUSES, 0)
+        for entry in row.get("statuses") or ():
+            by_status[entry["status"]] = entry["count"]
+
+        oldest = row.get("oldest")
+        if oldest is not None:
+            # pymongo vraca naivno UTC vreme
+            oldest = oldest.replace(tzinfo=dt_timezone.utc)
+        due = row.get("due")
+        balance = due.to_decimal() if isinstance(due, Decimal128) else Decimal("0.00")
+
+        tables.append({
+            "table_number": row["_id"],
+            "open_orders": row.get("open") or 0,
+            "by_status": {str(s): n for s, n in by_status.items()},
+            "oldest_unpaid_at": oldest.isoformat() if oldest else None,
+            "oldest_unpaid_seconds": int((now - oldest).total_seconds()) if oldest else None,
+            "balance": str(balance),
+        })
+    return {"generated_at": now.isoformat(), "tables": tables}
+
+
+_overview = None
+_built_at = 0.0
+_overview_lock = threading.Lock()
+
+
+def tables_overview():
+    # jedan pregled po intervalu za ceo worker, bez obzira koliko uredjaja ga prati
+    global _overview, _built_at
+
+    if _overview is not None and time.monotonic() - _built_at < settings.TABLES_OVERVIEW_TTL_SECONDS:
+        return _overview
+
+    with _overview_lock:
+        # dok smo cekali, neki drugi zahtev je mozda vec osvezio pregled
+        if _overview is None or time.monotonic() - _built_at >= settings.TABLES_OVERVIEW_TTL_SECONDS:
+            _overview = build_tables_overview()
+            _built_at = time.monotonic()
+        return _overview
@@ -1,7 +1,11 @@
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from helpers.responses import created_response, success, bad_request, not_found
 from .models import Table
+from .utils import tables_overview
+from helpers.asyncmongo import async_database
+from decimal import Decimal
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.db import IntegrityError
 
 
 @csrf_protect
@@ -10,7 +14,11 @@ def add_table(request, table_number: int):
     if Table.objects.filter(table_number=table_number).exists():
         return bad_request("Table already exists")
 
-    table = Table.objects.create(table_number=table_number)
+    try:
+        table = Table.objects.create(table_number=table_number)
+    except IntegrityError:
+        # jedinstveni indeks na table_number (ensure_indexes)
+        return bad_request("Table already exists")
     return created_response("Table added", str(table.id))
 
 
@@ -23,7 +31,10 @@ def add_next_table(request):
         table_number = 1
     else:
         table_number = last_added_table.table_number + 1
-    table = Table.objects.create(table_number=table_number)
+    try:
+        table = Table.objects.create(table_number=table_number)
+    except IntegrityError:
+        return bad_request("Table was added concurrently, try again", status=409)
     return created_response("Table added", str(table.id))
 
 
@@ -35,6 +46,20 @@ def get_tables(request):
     return success(data)
 
 
+@require_GET
+async def aget_tables(request):
+    cursor = async_database()[Table._meta.db_table].find({}, {"table_number": 1, "amount_due": 1})
+    data = [{"id": str(t["_id"]), "table_number": t["table_number"],
+             "amount_due": str(t["amount_due"].to_decimal() if t.get("amount_due") is not None else Decimal("0.00"))}
+            async for t in cursor]
+    return success(data)
+
+
+@require_GET
+def tables_overview_view(request):
+    return success(tables_overview())
+
+
 @require_GET
 def get_table(request, table_number: int):
     try: